@@ -1,3 +1,7 @@
+import json
+import os
+import time
+
 from ansible.plugins.callback.default import CallbackModule as DefaultCallbackModule
 
 DOCUMENTATION = """
@@ -7,6 +11,11 @@ DOCUMENTATION = """
     description:
         - Suppresses default Ansible output for plays tagged with
           foremanctl_suppress_default_output, displaying only task msg rather than ansible default output.
+        - Prints a table of phase timings published through set_stats as foremanctl_phases.
+        - Prints the time every service started by the service_startup module took to become ready.
+        - When the profile variable is set, records the wall time of every task, role and handler
+          and the retries of until loops, prints the slowest ones at the end of the run and
+          writes a JSON trace to the foremanctl state directory.
     extends_documentation_fragment:
       - default_callback
       - result_format_callback
@@ -15,6 +24,126 @@ DOCUMENTATION = """
 """
 
 
+def format_size(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def format_phases(phases):
+    """Render phase timings as a table with a total row."""
+    output = [f"{'PHASE':<20} {'SECONDS':>10} {'SIZE':>12} {'MB/s':>10}"]
+    for phase in phases:
+        size = int(phase.get('bytes', 0))
+        rate = f"{float(phase['mb_per_second']):.2f}" if size else '-'
+        output.append(f"{phase['name']:<20} {float(phase['seconds']):>10.2f} "
+                      f"{format_size(size) if size else '-':>12} {rate:>10}")
+    total = sum(float(phase['seconds']) for phase in phases)
+    output.append(f"{'total':<20} {total:>10.2f}")
+    return "\n".join(output)
+
+
+def format_startup(services):
+    """Render the services brought up by service_startup, with the time they waited for their dependencies."""
+    output = [f"{'SERVICE':<45} {'WAITED':>8} {'READY IN':>9} {'STATE':>8}"]
+    for service in services:
+        waited = f"{float(service['started']):.2f}" if service.get('started') is not None else '-'
+        seconds = f"{float(service['seconds']):.2f}" if service.get('seconds') is not None else '-'
+        output.append(f"{service['name']:<45} {waited:>8} {seconds:>9} {service['state']:>8}")
+    return "\n".join(output)
+
+
+class TaskProfile:
+    """Wall time of the tasks run by a playbook, in the order they started."""
+
+    def __init__(self, clock=time.monotonic):
+        self.tasks = []
+        self._clock = clock
+        self._current = None
+        self._started = None
+
+    def start(self, name, role=None, handler=False):
+        """Start timing a task, which ends the previous one."""
+        self.stop()
+        self._current = {
+            'name': name,
+            'role': role,
+            'handler': handler,
+            'start': time.time(),
+            'seconds': 0.0,
+            'retries': 0,
+            'changed': 0,
+        }
+        self._started = self._clock()
+        self.tasks.append(self._current)
+
+    def stop(self):
+        if self._current is not None:
+            self._current['seconds'] = round(self._clock() - self._started, 3)
+            self._current = None
+
+    def retried(self):
+        if self._current is not None:
+            self._current['retries'] += 1
+
+    def changed(self):
+        if self._current is not None:
+            self._current['changed'] += 1
+
+    def roles(self):
+        """Return [role, seconds, tasks] sorted by descending time."""
+        roles = {}
+        for task in self.tasks:
+            entry = roles.setdefault(task['role'] or '-', [task['role'] or '-', 0.0, 0])
+            entry[1] += task['seconds']
+            entry[2] += 1
+        return sorted(roles.values(), key=lambda entry: entry[1], reverse=True)
+
+    def handlers(self):
+        """Return [handler, seconds, changed] for each handler that ran, sorted by descending time."""
+        handlers = {}
+        for task in self.tasks:
+            if task['handler']:
+                entry = handlers.setdefault(task['name'], [task['name'], 0.0, 0])
+                entry[1] += task['seconds']
+                entry[2] += task['changed']
+        return sorted(handlers.values(), key=lambda entry: entry[1], reverse=True)
+
+    def report(self, top):
+        """Render the slowest tasks, every role, the handlers and the retried tasks as titled tables."""
+        slowest = sorted(self.tasks, key=lambda task: task['seconds'], reverse=True)[:top]
+        retried = sorted((task for task in self.tasks if task['retries']),
+                         key=lambda task: task['seconds'], reverse=True)
+
+        def task_rows(tasks):
+            rows = [f"{'SECONDS':>10} {'RETRIES':>8} {'ROLE':<25} TASK"]
+            rows.extend(f"{task['seconds']:>10.2f} {task['retries']:>8} {task['role'] or '-':<25} {task['name']}"
+                        for task in tasks)
+            return "\n".join(rows)
+
+        sections = [
+            (f'SLOWEST TASKS (top {top})', task_rows(slowest)),
+            ('ROLES', "\n".join([f"{'SECONDS':>10} {'TASKS':>8} ROLE"]
+                                + [f"{seconds:>10.2f} {count:>8} {role}" for role, seconds, count in self.roles()])),
+        ]
+        if handlers := self.handlers():
+            sections.append(('HANDLERS', "\n".join(
+                [f"{'SECONDS':>10} {'CHANGED':>8} HANDLER"]
+                + [f"{seconds:>10.2f} {changed:>8} {name}" for name, seconds, changed in handlers])))
+        if retried:
+            sections.append(('RETRIED TASKS', task_rows(retried)))
+        return sections
+
+    def trace(self):
+        return {
+            'tasks': self.tasks,
+            'roles': [{'role': role, 'seconds': round(seconds, 3), 'tasks': count}
+                      for role, seconds, count in self.roles()],
+        }
+
+
 class CallbackModule(DefaultCallbackModule):
     """Foremanctl callback."""
 
@@ -24,7 +153,17 @@ class CallbackModule(DefaultCallbackModule):
 
     FALLBACK_TO_DEFAULT = True
 
+    PROFILE_TOP = 20
+
+    def __init__(self):
+        super().__init__()
+        self._playbook_name = None
+        self._profile = None
+        self._trace_dir = None
+        self._startup = []
+
     def v2_playbook_on_start(self, playbook):
+        self._playbook_name = os.path.splitext(os.path.basename(playbook._file_name))[0]
         plays = playbook.get_plays()
         tags = plays[0].tags
         if 'foremanctl_suppress_default_output' in tags:
@@ -33,20 +172,79 @@ class CallbackModule(DefaultCallbackModule):
             super().v2_playbook_on_start(playbook)
 
     def v2_playbook_on_play_start(self, play):
+        if self._profile is None:
+            extra_vars = play.get_variable_manager().extra_vars
+            if extra_vars.get('profile'):
+                self._profile = TaskProfile()
+                self._trace_dir = extra_vars.get('obsah_state_path')
         if self.FALLBACK_TO_DEFAULT:
             super().v2_playbook_on_play_start(play)
 
     def v2_playbook_on_task_start(self, task, is_conditional):
+        if self._profile is not None:
+            self._profile.start(task.get_name(), task._role.get_name() if task._role else None)
         if self.FALLBACK_TO_DEFAULT:
             super().v2_playbook_on_task_start(task, is_conditional)
 
+    def v2_playbook_on_handler_task_start(self, task):
+        if self._profile is not None:
+            self._profile.start(task.get_name(), task._role.get_name() if task._role else None, handler=True)
+        if self.FALLBACK_TO_DEFAULT:
+            super().v2_playbook_on_handler_task_start(task)
+
+    def v2_runner_retry(self, result):
+        if self._profile is not None:
+            self._profile.retried()
+        if self.FALLBACK_TO_DEFAULT:
+            super().v2_runner_retry(result)
+
     def v2_runner_on_ok(self, result):
+        self._record_startup(result)
+        if self._profile is not None and result._result.get('changed'):
+            self._profile.changed()
         if self.FALLBACK_TO_DEFAULT:
             super().v2_runner_on_ok(result)
         else:
             if msg := result._result.get('msg'):
                 self._display.display(msg)
 
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record_startup(result)
+        super().v2_runner_on_failed(result, ignore_errors)
+
+    def _record_startup(self, result):
+        if result._task.action.rsplit('.', 1)[-1] == 'service_startup':
+            self._startup.extend(result._result.get('services') or [])
+
     def v2_playbook_on_stats(self, stats):
         if self.FALLBACK_TO_DEFAULT:
             super().v2_playbook_on_stats(stats)
+        if self._startup:
+            self._display.banner('SERVICE STARTUP')
+            self._display.display(format_startup(self._startup))
+        phases = stats.custom.get('_run', {}).get('foremanctl_phases')
+        if phases:
+            self._display.banner('PHASE TIMINGS')
+            self._display.display(format_phases(phases))
+        if self._profile is not None:
+            self._profile.stop()
+            for title, table in self._profile.report(self.PROFILE_TOP):
+                self._display.banner(title)
+                self._display.display(table)
+            self._write_trace(phases)
+
+    def _write_trace(self, phases):
+        if not self._trace_dir:
+            return
+        trace = self._profile.trace()
+        if phases:
+            trace['phases'] = phases
+        path = os.path.join(self._trace_dir, f'profile-{self._playbook_name}.json')
+        try:
+            os.makedirs(self._trace_dir, exist_ok=True)
+            with open(path, 'w') as trace_file:
+                json.dump(trace, trace_file, indent=2)
+        except OSError as e:
+            self._display.warning(f"Could not write profile trace to {path}: {e}")
+        else:
+            self._display.display(f"Profile trace written to {path}")
@@ -0,0 +1,57 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__metaclass__ = type
+
+
+def _metrics(report):
+    """Flatten the timings of a startup_benchmark report into metric names and seconds."""
+    metrics = {}
+    for name in ('target', 'usable'):
+        if report.get(name) is not None:
+            metrics[name] = float(report[name])
+    for name, seconds in (report.get('endpoints') or {}).items():
+        if seconds is not None:
+            metrics[f'endpoint {name}'] = float(seconds)
+    for unit in report.get('units') or []:
+        if unit.get('seconds') is not None:
+            metrics[f"unit {unit['name']}"] = float(unit['seconds'])
+    return metrics
+
+
+def startup_regressions(report, baseline, threshold=20, min_seconds=2):
+    """
+    Compare a startup benchmark with a baseline.
+
+    A timing regressed when it grew by more than threshold percent and by at
+    least min_seconds, so sub-second units jittering between runs are not
+    flagged. Timings missing from either report are not compared.
+
+    Returns:
+        list: dicts of metric, baseline and current seconds and the increase in percent
+    """
+    current = _metrics(report or {})
+    previous = _metrics(baseline or {})
+    regressions = []
+    for metric, seconds in current.items():
+        before = previous.get(metric)
+        if before is None:
+            continue
+        if seconds > before * (1 + float(threshold) / 100) and seconds - before >= float(min_seconds):
+            regressions.append({
+                'metric': metric,
+                'baseline': before,
+                'current': seconds,
+                'increase': round((seconds - before) / before * 100, 1) if before else None,
+            })
+    return sorted(regressions, key=lambda regression: regression['current'] - regression['baseline'], reverse=True)
+
+
+class FilterModule(object):
+    '''foremanctl startup benchmark filters'''
+
+    def filters(self):
+        return {
+            'startup_regressions': startup_regressions,
+        }
@@ -0,0 +1,366 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__metaclass__ = type
+
+import hashlib
+import json
+import pathlib
+
+import yaml
+from jinja2 import Environment
+from jinja2 import nodes
+from jinja2.exceptions import TemplateSyntaxError
+
+_ROLES = pathlib.Path(__file__).parent.parent / 'roles'
+
+_JINJA = Environment(extensions=['jinja2.ext.do', 'jinja2.ext.loopcontrols'])
+
+# Keys whose values are bare Jinja expressions rather than templates
+_CONDITIONALS = ('when', 'changed_when', 'failed_when', 'until', 'that')
+
+_INCLUDE_ROLE = ('include_role', 'import_role', 'ansible.builtin.include_role', 'ansible.builtin.import_role')
+_INCLUDE_TASKS = ('include_tasks', 'import_tasks', 'ansible.builtin.include_tasks', 'ansible.builtin.import_tasks')
+_SET_FACT = ('set_fact', 'ansible.builtin.set_fact')
+
+# Names Ansible or Jinja define for every task, which are no inputs of a role
+_MAGIC = {
+    'ansible_check_mode', 'ansible_failed_result', 'ansible_failed_task', 'ansible_index_var', 'ansible_loop',
+    'ansible_loop_var', 'ansible_parent_role_names', 'ansible_play_batch', 'ansible_play_hosts',
+    'ansible_play_hosts_all', 'ansible_role_names', 'ansible_verbosity', 'ansible_version', 'dict', 'group_names',
+    'groups', 'inventory_hostname', 'inventory_hostname_short', 'item', 'lookup', 'loop', 'now', 'omit', 'playbook_dir',
+    'q', 'query', 'range', 'role_name', 'role_path', 'undef',
+}
+
+# Names giving access to variables chosen at runtime, so the inputs cannot be listed
+_DYNAMIC = {'vars', 'hostvars'}
+_DYNAMIC_LOOKUPS = {'vars', 'varnames', 'ansible.builtin.vars', 'ansible.builtin.varnames'}
+
+# Facts only set by a module a role runs, like registered variables
+_RUNTIME_FACTS = {
+    'packages': ('package_facts', 'ansible.builtin.package_facts'),
+    'services': ('service_facts', 'ansible.builtin.service_facts'),
+}
+
+
+class _Sources:
+    """The variable references, runtime names and included roles found in role files or playbook entries."""
+
+    def __init__(self):
+        self.references = set()
+        self.facts = set()
+        self.runtime = set()
+        self.modules = set()
+        self.roles = set()
+        self.includes = set()
+        self.incomplete = []
+
+    def template(self, text, expression=False):
+        """Collect the variables a template, or a bare expression like a when condition, references."""
+        if not isinstance(text, str) or (not expression and '{{' not in text and '{%' not in text):
+            return
+        try:
+            ast = _JINJA.parse('{{ (%s) }}' % text if expression else text)
+        except TemplateSyntaxError as e:
+            self.incomplete.append(f'cannot parse {text!r}: {e}')
+            return
+        # only parsed, as compiling needs the Ansible filters and tests; names a template assigns are its own
+        declared = {node.name for node in ast.find_all(nodes.Name) if node.ctx in ('store', 'param')}
+        names = {node.name for node in ast.find_all(nodes.Name) if node.ctx == 'load'} - declared
+        if names & _DYNAMIC:
+            self.incomplete.append(f'{text!r} accesses variables by computed names')
+        self.references.update(names - {'ansible_facts'})
+        for node in ast.find_all((nodes.Getattr, nodes.Getitem, nodes.Call)):
+            if isinstance(node, nodes.Call):
+                if (isinstance(node.node, nodes.Name) and node.node.name in ('lookup', 'query', 'q') and node.args
+                        and isinstance(node.args[0], nodes.Const) and node.args[0].value in _DYNAMIC_LOOKUPS):
+                    self.incomplete.append(f'{text!r} looks up variables by computed names')
+            elif isinstance(node.node, nodes.Name) and node.node.name == 'ansible_facts':
+                key = node.attr if isinstance(node, nodes.Getattr) else getattr(node.arg, 'value', None)
+                if isinstance(key, str):
+                    self.facts.add(key)
+                else:
+                    self.incomplete.append(f'{text!r} accesses ansible_facts by a computed key')
+
+    def data(self, value):
+        """Collect the references of every template in a loaded YAML document."""
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key in _CONDITIONALS:
+                    for condition in item if isinstance(item, list) else [item]:
+                        self.template(condition, expression=True)
+                else:
+                    self.data(item)
+        elif isinstance(value, list):
+            for item in value:
+                self.data(item)
+        else:
+            self.template(value)
+
+    def tasks(self, value):
+        """Collect the names tasks define and the roles they include, descending into blocks."""
+        for task in value if isinstance(value, list) else []:
+            if not isinstance(task, dict):
+                continue
+            for key in ('block', 'rescue', 'always'):
+                self.tasks(task.get(key))
+            self.modules.update(task)
+            if isinstance(task.get('register'), str):
+                self.runtime.add(task['register'])
+            for key in ('vars', *_SET_FACT):
+                if isinstance(task.get(key), dict):
+                    self.runtime.update(task[key])
+            loop_control = task.get('loop_control')
+            if isinstance(loop_control, dict):
+                self.runtime.update(loop_control[key] for key in ('loop_var', 'index_var') if key in loop_control)
+            for key in _INCLUDE_ROLE:
+                if isinstance(task.get(key), dict):
+                    self.role(task[key].get('name'), task[key].get('tasks_from'))
+            for key in _INCLUDE_TASKS:
+                if key in task:
+                    include = task[key].get('file') if isinstance(task[key], dict) else task[key]
+                    self.includes.add(None if _computed(include) else include)
+
+    def role(self, name, tasks_from=None):
+        if _computed(name) or (tasks_from is not None and _computed(tasks_from)):
+            self.incomplete.append(f'includes a role by a computed name: {name!r}')
+        else:
+            self.roles.add((name, tasks_from))
+
+
+def _computed(name):
+    return not isinstance(name, str) or '{{' in name or '{%' in name
+
+
+def _load(path):
+    try:
+        return yaml.safe_load(path.read_text())
+    except yaml.YAMLError as e:
+        return e
+
+
+def _parse(sources, path, kind):
+    content = _load(path)
+    if isinstance(content, yaml.YAMLError):
+        sources.incomplete.append(f'cannot parse {path}: {content}')
+        return
+    sources.data(content)
+    if kind == 'meta':
+        for dependency in (content or {}).get('dependencies') or []:
+            sources.role(dependency.get('role', dependency.get('name')) if isinstance(dependency, dict) else dependency)
+    else:
+        sources.tasks(content)
+
+
+def _role_sources(role, roles_path, tasks_from=None):
+    """
+    Parse the files of a role an include of its tasks_from runs, every task file when tasks_from is None.
+
+    Defaults, vars, handlers, templates and meta always are, as the
+    defaults of a role included by a task are not resolved before it runs.
+    """
+    sources = _Sources()
+    directory = roles_path / role
+    if not directory.is_dir():
+        sources.incomplete.append(f'role {role} not found in {roles_path}')
+        return sources
+    for path in sorted(directory.rglob('*')):
+        if not path.is_file() or '__pycache__' in path.parts:
+            continue
+        kind = path.relative_to(directory).parts[0]
+        if kind == 'templates':
+            sources.template(path.read_text())
+        elif kind in ('defaults', 'vars') and path.suffix in ('.yml', '.yaml'):
+            content = _load(path)
+            if isinstance(content, yaml.YAMLError):
+                sources.incomplete.append(f'cannot parse {path}: {content}')
+            else:
+                sources.data(content)
+        elif path.suffix in ('.yml', '.yaml') and (kind in ('handlers', 'meta') or kind == 'tasks' and tasks_from is None):
+            _parse(sources, path, kind)
+    if tasks_from is None:
+        return sources
+
+    tasks = directory / 'tasks'
+    pending = [tasks / (tasks_from if pathlib.Path(tasks_from).suffix else f'{tasks_from}.yml')]
+    if not pending[0].exists():
+        pending[0] = pending[0].with_suffix('.yaml')
+    parsed = set()
+    while pending:
+        path = pending.pop().resolve()
+        if path in parsed:
+            continue
+        if not path.is_file():
+            sources.incomplete.append(f'{path} not found')
+            continue
+        parsed.add(path)
+        sources.includes.clear()
+        _parse(sources, path, 'tasks')
+        if None in sources.includes:
+            # a computed include may run any task file of the role
+            return _role_sources(role, roles_path)
+        pending.extend(path.parent / name if (path.parent / name).exists() else tasks / name
+                       for name in sources.includes)
+    return sources
+
+
+def _role_files(roles, roles_path):
+    """Hash the files of roles."""
+    digest = hashlib.sha256()
+    for role in sorted(roles):
+        for path in sorted((roles_path / role).rglob('*')):
+            if path.is_file() and '__pycache__' not in path.parts:
+                digest.update(str(path.relative_to(roles_path)).encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _dumps(variables, name):
+    """
+    Return the JSON text of a variable.
+
+    Variables that cannot be resolved yet, because they depend on facts or
+    results a role only sets while it runs, are recorded as undefined.
+    """
+    try:
+        return json.dumps(variables[name], sort_keys=True, default=str)
+    except Exception:  # undefined values raise on access or serialization
+        return None
+
+
+def _image_ids(resolved, images):
+    """Return the IDs of the images whose repository or full name is the value of a resolved variable."""
+    values = {json.loads(value) for value in resolved.values() if value and value.startswith('"')}
+    ids = {}
+    for image in images or []:
+        for name in image.get('Names') or []:
+            if name in values or name.rsplit(':', 1)[0] in values:
+                ids[name] = image['Id']
+    return ids
+
+
+def cached_roles(playbook):
+    """Return the role entries of a playbook that the deploy cache can skip, keyed by role name."""
+    entries = {}
+    for play in yaml.safe_load(pathlib.Path(playbook).read_text()) or []:
+        for entry in play.get('roles') or []:
+            if not isinstance(entry, dict):
+                continue
+            when = entry.get('when') or []
+            if any('deploy_cache_skipped' in condition for condition in (when if isinstance(when, list) else [when])):
+                entries[entry['role']] = entry
+    return entries
+
+
+def role_inputs(role, entry=None, roles_path=_ROLES):
+    """
+    Find the inputs of a role from the files of the role and of the roles it includes.
+
+    Returns the roles whose files belong to it, the variables and
+    ansible_facts keys they reference and the reasons the inputs cannot be
+    listed completely, if any. The entry of the role in the playbook adds
+    the references of its when conditions, except the deploy cache one, and
+    of the variables it passes.
+    """
+    roles_path = pathlib.Path(roles_path)
+    sources = _Sources()
+    if entry:
+        when = entry.get('when') or []
+        sources.data({'when': [condition for condition in (when if isinstance(when, list) else [when])
+                               if 'deploy_cache_skipped' not in condition]})
+        sources.data(entry.get('vars') or {})
+        sources.runtime.update(entry.get('vars') or {})
+    roles = set()
+    included = set()
+    pending = [(role, None)]
+    while pending:
+        name, tasks_from = pending.pop()
+        if (name, tasks_from) in included or (name, None) in included:
+            continue
+        included.add((name, tasks_from))
+        roles.add(name)
+        found = _role_sources(name, roles_path, tasks_from)
+        sources.references |= found.references
+        sources.facts |= found.facts
+        sources.runtime |= found.runtime
+        sources.modules |= found.modules
+        sources.incomplete += found.incomplete
+        pending.extend(found.roles - included)
+    sources.roles = roles
+    for fact in sources.facts & set(_RUNTIME_FACTS):
+        if not sources.modules & set(_RUNTIME_FACTS[fact]):
+            sources.incomplete.append(f'ansible_facts.{fact} is only set by {_RUNTIME_FACTS[fact][0]}')
+    return sources
+
+
+def _runtime_names(roles_path):
+    """Return the names the tasks of every role register or set, mapping to the roles setting them."""
+    names = {}
+    for directory in sorted(roles_path.iterdir()):
+        if directory.is_dir():
+            for name in _role_sources(directory.name, roles_path).runtime:
+                names.setdefault(name, set()).add(directory.name)
+    return names
+
+
+def deploy_fingerprints(variables, playbook, common=(), images=(), roles_path=_ROLES):
+    """
+    Compute a fingerprint of the inputs of every role the playbook lets the deploy cache skip.
+
+    The inputs of a role are the variables referenced by its tasks,
+    handlers and templates, by those of the roles it includes and by its
+    entry in the playbook, the keys of ansible_facts they use, the files of
+    these roles, the IDs of the images the variables name, and the common
+    variables, which every role depends on. A role whose inputs cannot be
+    listed completely, because it reaches variables by computed names or
+    uses a value another role only sets while it runs, has no fingerprint
+    and is never skipped.
+    """
+    roles_path = pathlib.Path(roles_path)
+    runtime = _runtime_names(roles_path)
+    resolved_common = {name: _dumps(variables, name) for name in sorted(common) if name in variables}
+    fingerprints = {}
+    for role, entry in cached_roles(playbook).items():
+        inputs = role_inputs(role, entry, roles_path)
+        incomplete = list(inputs.incomplete)
+        resolved = {}
+        for name in sorted(inputs.references - inputs.runtime - _MAGIC):
+            setters = runtime.get(name, set())
+            if setters & inputs.roles:
+                continue  # state of an included role, like the jobs of the images role it waits for
+            if setters:
+                incomplete.append(f'{name} is set by {", ".join(sorted(setters))} while it runs')
+            else:
+                resolved[name] = _dumps(variables, name) if name in variables else None
+        facts = _dumps(variables, 'ansible_facts') if inputs.facts else None
+        facts = json.loads(facts) if facts else {}
+        if incomplete:
+            fingerprints[role] = None
+            continue
+        content = {
+            'variables': resolved,
+            'facts': {key: facts.get(key) for key in sorted(inputs.facts - set(_RUNTIME_FACTS))},
+            'common': resolved_common,
+            'files': _role_files(inputs.roles, roles_path),
+            'images': _image_ids(resolved, images),
+        }
+        fingerprints[role] = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+    return fingerprints
+
+
+def unchanged_roles(fingerprints, previous):
+    """Return the roles whose fingerprint matches the one recorded by the previous deploy."""
+    previous = previous or {}
+    return [role for role, fingerprint in fingerprints.items()
+            if fingerprint is not None and previous.get(role) == fingerprint]
+
+
+class FilterModule(object):
+    '''foremanctl deploy cache filters'''
+
+    def filters(self):
+        return {
+            'deploy_fingerprints': deploy_fingerprints,
+            'unchanged_roles': unchanged_roles,
+        }
@@ -4,6 +4,9 @@ from __future__ import print_function
 
 __metaclass__ = type
 
+import collections.abc
+import functools
+import json
 import os
 import pathlib
 
@@ -13,16 +16,104 @@ BASE_FEATURES = ['hammer', 'foreman-proxy', 'foreman']
 
 _SRC_ROOT = pathlib.Path(__file__).parent.parent
 features_yaml = _SRC_ROOT / 'features.yaml'
-with features_yaml.open() as features_file:
-    FEATURE_MAP = yaml.safe_load(features_file)
-
-# load additional feature files under features.d
 _features_d = _SRC_ROOT / 'features.d'
-if _features_d.is_dir():
-    for _overlay in sorted(_features_d.glob('*.yaml')):
-        with _overlay.open() as _overlay_file:
-            _extra = yaml.safe_load(_overlay_file) or {}
-        FEATURE_MAP.update(_extra)
+
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_CACHE_NAME = 'features-cache.json'
+_CACHE_VERSION = 1
+
+
+def _feature_files():
+    files = [features_yaml]
+    # load additional feature files under features.d
+    if _features_d.is_dir():
+        files.extend(sorted(_features_d.glob('*.yaml')))
+    return files
+
+
+def _load_yaml(path):
+    with path.open() as yaml_file:
+        return yaml.load(yaml_file, Loader=_YAML_LOADER)
+
+
+def _read_feature_map(files):
+    feature_map = _load_yaml(files[0])
+    for overlay in files[1:]:
+        feature_map.update(_load_yaml(overlay) or {})
+    return feature_map
+
+
+def _cache_path():
+    state = os.environ.get('OBSAH_STATE')
+    return pathlib.Path(state) / _CACHE_NAME if state else None
+
+
+def load_feature_catalog(cache_path=None):
+    """Return the feature metadata, reusing the serialized cache while no source file changed."""
+    files = _feature_files()
+    key = []
+    for path in files:
+        stat = path.stat()
+        key.append([str(path), stat.st_mtime_ns, stat.st_size])
+
+    if cache_path is not None:
+        try:
+            with cache_path.open() as cache_file:
+                cached = json.load(cache_file)
+            if cached.get('version') == _CACHE_VERSION and cached.get('key') == key:
+                return cached['features']
+        except (OSError, ValueError, AttributeError, KeyError):
+            pass
+
+    feature_map = _read_feature_map(files)
+
+    if cache_path is not None:
+        tmp_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}.tmp')
+        try:
+            with tmp_path.open('w') as cache_file:
+                json.dump({'version': _CACHE_VERSION, 'key': key, 'features': feature_map}, cache_file)
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError, ValueError):
+            # a missing cache only means the YAML gets parsed again next time
+            tmp_path.unlink(missing_ok=True)
+    return feature_map
+
+
+class _LazyFeatureMap(collections.abc.MutableMapping):
+    """The feature metadata, loaded on first access."""
+
+    def __init__(self):
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = load_feature_catalog(_cache_path())
+        return self._data
+
+    def reload(self):
+        self._data = None
+        _clear_derived()
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        _clear_derived()
+
+    def __delitem__(self, key):
+        del self.data[key]
+        _clear_derived()
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+FEATURE_MAP = _LazyFeatureMap()
 
 
 def compact_list(items):
@@ -43,26 +134,148 @@ def filter_features(items):
     return items
 
 
+class FeatureIndex:
+    """Precomputed dependency lookups for a feature map."""
+
+    def __init__(self, feature_map):
+        graph = {name: list((meta or {}).get('dependencies', [])) for name, meta in feature_map.items()}
+        self.dependencies = {name: frozenset(_reachable(graph, name)) for name in graph}
+        dependents = {}
+        for name, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                dependents.setdefault(dependency, set()).add(name)
+        self.dependents = {name: frozenset(features) for name, features in dependents.items()}
+        subfeatures = {}
+        for name in graph:
+            parts = name.split('/')
+            for i in range(1, len(parts)):
+                subfeatures.setdefault('/'.join(parts[:i]), set()).add(name)
+        self.subfeatures = {prefix: frozenset(features) for prefix, features in subfeatures.items()}
+        self._providers = {name: frozenset({name})
+                           | self.dependents.get(name, frozenset())
+                           | self.subfeatures.get(name, frozenset())
+                           for name in set(graph) | set(self.dependents) | set(self.subfeatures)}
+        self.cycles = _find_cycles(graph)
+
+    def get_dependencies(self, feature):
+        """Return the transitive dependencies of a feature."""
+        return self.dependencies.get(feature, frozenset())
+
+    def providers(self, feature):
+        """Return every known feature that, when enabled, makes has_feature(feature) true."""
+        return self._providers.get(feature) or frozenset({feature})
+
+
+def _reachable(graph, start):
+    reachable = set()
+    stack = list(graph.get(start, []))
+    while stack:
+        feature = stack.pop()
+        if feature not in reachable:
+            reachable.add(feature)
+            stack.extend(graph.get(feature, []))
+    return reachable
+
+
+def _find_cycles(graph):
+    cycles = []
+    state = {}
+    for root in graph:
+        if root in state:
+            continue
+        state[root] = 'visiting'
+        path = [root]
+        stack = [iter(graph[root])]
+        while stack:
+            dependency = next(stack[-1], None)
+            if dependency is None:
+                state[path.pop()] = 'done'
+                stack.pop()
+            elif state.get(dependency) == 'visiting':
+                cycles.append(path[path.index(dependency):] + [dependency])
+            elif dependency not in state:
+                state[dependency] = 'visiting'
+                path.append(dependency)
+                stack.append(iter(graph.get(dependency, [])))
+    return cycles
+
+
+@functools.lru_cache(maxsize=None)
+def feature_index():
+    """Return the FeatureIndex for the current feature metadata."""
+    return FeatureIndex(FEATURE_MAP)
+
+
+class FeatureResolution:
+    """Everything derived from one list of enabled features, computed once."""
+
+    def __init__(self, features):
+        self.features = tuple(features)
+        self._enabled = frozenset(self.features)
+        self.resolved = self._enabled | get_dependencies(self.features)
+        ordered = _with_dependencies(self.features)
+        self.foreman_plugins = compact_list(
+            FEATURE_MAP.get(feature, {}).get('foreman', {}).get('plugin_name') for feature in ordered)
+        self.hammer_plugins = compact_list(FEATURE_MAP.get(feature, {}).get('hammer') for feature in ordered)
+        self.foreman_proxy_plugins = compact_list(
+            FEATURE_MAP.get(feature, {}).get('foreman_proxy', {}).get('plugin_name') for feature in ordered)
+        self._has_feature = {}
+
+    def has_feature(self, feature):
+        if feature not in self._has_feature:
+            found = not self._enabled.isdisjoint(feature_index().providers(feature))
+            if not found:
+                # features unknown to the index can still match by prefix
+                prefix = feature + '/'
+                found = any(f.startswith(prefix) for f in self._enabled if f not in FEATURE_MAP)
+            self._has_feature[feature] = found
+        return self._has_feature[feature]
+
+    def databases(self, databases):
+        return [db for db in databases if self.has_feature(db['feature'])]
+
+
+@functools.lru_cache(maxsize=32)
+def _resolve_features(features):
+    return FeatureResolution(features)
+
+
+def resolve_features(features):
+    """Return the cached FeatureResolution for a list of enabled features."""
+    return _resolve_features(tuple(features))
+
+
+def _clear_derived():
+    """Drop the lookups computed from the feature metadata, after it changed."""
+    feature_index.cache_clear()
+    _resolve_features.cache_clear()
+
+
+def reload_feature_map():
+    """Re-read the feature metadata and drop everything derived from it."""
+    FEATURE_MAP.reload()
+
+
 def get_dependencies_for_feature(feature):
-    dependencies = set()
-    for dependency in FEATURE_MAP.get(feature, {}).get('dependencies', []):
-        if dependency not in dependencies:
-            dependencies.update(get_dependencies_for_feature(dependency))
-        dependencies.add(dependency)
-    return dependencies
+    return set(feature_index().get_dependencies(feature))
 
 
 def get_dependencies(features):
     dependencies = set()
     for feature in features:
-        dependencies.update(get_dependencies_for_feature(feature))
+        dependencies.update(feature_index().get_dependencies(feature))
     return dependencies
 
 
+def _with_dependencies(value):
+    """Return the requested non-base features followed by their dependencies, without duplicates."""
+    features = list(filter_features(value))
+    dependencies = sorted(get_dependencies(features))
+    return list(dict.fromkeys(filter_features(features + dependencies)))
+
+
 def foreman_plugins(value):
-    dependencies = list(get_dependencies(filter_features(value)))
-    plugins = [FEATURE_MAP.get(feature, {}).get('foreman', {}).get('plugin_name') for feature in filter_features(value + dependencies)]
-    return compact_list(plugins)
+    return list(resolve_features(value).foreman_plugins)
 
 
 def available_foreman_plugins(_value):
@@ -111,16 +324,17 @@ def conflicting_features(features):
     return [f"{pair[0]} conflicts with {pair[1]}" for pair in conflicts]
 
 
+def feature_dependency_cycles(_value):
+    """Return a list of dependency cycles found in the feature metadata."""
+    return [' -> '.join(cycle) for cycle in feature_index().cycles]
+
+
 def hammer_plugins(value):
-    dependencies = list(get_dependencies(filter_features(value)))
-    plugins = [FEATURE_MAP.get(feature, {}).get('hammer') for feature in filter_features(value + dependencies)]
-    return compact_list(plugins)
+    return list(resolve_features(value).hammer_plugins)
 
 
 def foreman_proxy_plugins(value):
-    dependencies = list(get_dependencies(filter_features(value)))
-    plugins = [FEATURE_MAP.get(feature, {}).get('foreman_proxy', {}).get('plugin_name') for feature in filter_features(value + dependencies)]
-    return compact_list(plugins)
+    return list(resolve_features(value).foreman_proxy_plugins)
 
 
 def available_foreman_proxy_plugins(_value):
@@ -130,14 +344,12 @@ def available_foreman_proxy_plugins(_value):
 
 def has_feature(features, feature):
     """Check if a feature is enabled - exact match, prefix (feature/), or as a transitive dependency."""
-    return (feature in features
-            or any(f.startswith(feature + '/') for f in features)
-            or feature in get_dependencies(list(features)))
+    return resolve_features(features).has_feature(feature)
 
 
 def databases_for_features(databases, enabled_features):
     """Return databases whose feature gate matches enabled_features."""
-    return [db for db in databases if has_feature(enabled_features, db['feature'])]
+    return resolve_features(enabled_features).databases(databases)
 
 
 def to_postgresql_databases(databases):
@@ -161,6 +373,7 @@ class FilterModule(object):
             'list_all_features': list_all_features,
             'invalid_features': invalid_features,
             'conflicting_features': conflicting_features,
+            'feature_dependency_cycles': feature_dependency_cycles,
             'has_feature': has_feature,
             'databases_for_features': databases_for_features,
             'to_postgresql_databases': to_postgresql_databases,
@@ -0,0 +1,149 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+__metaclass__ = type
+
+import math
+
+# Matches foreman_puma_threads_max and foreman_database_pool of the foreman role.
+PUMA_THREADS = 5
+FOREMAN_DATABASE_POOL = 9
+# dynflow-sidekiq@orchestrator, @worker and @worker-hosts-queue, each with its own Rails pool
+DYNFLOW_PROCESSES = 3
+# The Hibernate connection pool and the Quartz data source of Candlepin
+CANDLEPIN_CONNECTIONS = 30
+# The IOP services, which share the PostgreSQL server when enabled
+IOP_CONNECTIONS = 60
+# pg_dump/pg_restore jobs, checks and administrative sessions
+MAINTENANCE_CONNECTIONS = 20
+CONNECTION_HEADROOM = 0.2
+
+HTTPD_THREADS_PER_CHILD = 16
+
+
+def _memory(mb, unit='MB'):
+    """Format a size in MB the way PostgreSQL (MB/GB) or the JVM (m/g) expect it."""
+    if mb % 1024 == 0:
+        return f'{mb // 1024}{"GB" if unit == "MB" else "g"}'
+    return f'{mb}{unit}'
+
+
+def _clamp(value, lower, upper):
+    return max(lower, min(upper, value))
+
+
+def _rotational(devices):
+    """Whether every disk is a spinning disk. Loop, RAM and device mapper devices are ignored."""
+    disks = [device for name, device in (devices or {}).items()
+             if not name.startswith(('loop', 'ram', 'dm-', 'sr', 'zram'))]
+    return bool(disks) and all(str(device.get('rotational')) == '1' for device in disks)
+
+
+def connection_budget(pools):
+    """
+    Return the PostgreSQL connections the configured pools of the services can open, by consumer.
+
+    pools holds the configured foreman_puma_workers, foreman_puma_threads_max,
+    foreman_database_pool, pulp_api_service_worker_count,
+    pulp_content_service_worker_count and pulp_worker_count. With
+    pooler_pool_size, Foreman connects through the pooler, which opens at
+    most that many connections itself. With iop, the IOP services are
+    counted too.
+    """
+    database_pool = int(pools['foreman_database_pool'])
+    if int(pools.get('pooler_pool_size') or 0):
+        connections = {'pooler': int(pools['pooler_pool_size'])}
+    else:
+        connections = {
+            # every puma thread holds at most one connection of the pool of its worker
+            'foreman_puma': int(pools['foreman_puma_workers']) * min(int(pools['foreman_puma_threads_max']),
+                                                                     database_pool),
+            'dynflow': DYNFLOW_PROCESSES * database_pool,
+        }
+    # every pulp worker holds a connection for its task and one to listen for new tasks
+    connections['pulp'] = (int(pools['pulp_api_service_worker_count']) + int(pools['pulp_content_service_worker_count'])
+                           + 2 * int(pools['pulp_worker_count']))
+    connections['candlepin'] = CANDLEPIN_CONNECTIONS
+    if pools.get('iop'):
+        connections['iop'] = IOP_CONNECTIONS
+    connections['maintenance'] = MAINTENANCE_CONNECTIONS
+    return connections
+
+
+def tuning_plan(facts, features=()):
+    """
+    Compute the tuning of every service from the CPUs, memory and disks of a host.
+
+    The services are sized first and PostgreSQL max_connections is derived
+    from them, so the database always accepts every connection the
+    configured pools can open. Sizes follow the fixed profiles: a host that
+    matches a profile gets roughly its values, and a host between two
+    profiles gets values in between.
+    """
+    cpus = int(facts['processor_nproc'])
+    ram_mb = int(facts['memtotal_mb'])
+    ram_gb = ram_mb / 1024
+    rotational = _rotational(facts.get('devices'))
+
+    # the same formulas as the foreman and pulp role defaults
+    puma_workers = int(max(1, min(32, cpus * 1.5, ram_gb - 1.5)))
+    pulp_workers = min(8, cpus)
+    pulp_api_workers = min(4, cpus) + 1
+    pulp_content_workers = 2 * min(8, cpus) + 1
+
+    connections = connection_budget({
+        'foreman_puma_workers': puma_workers,
+        'foreman_puma_threads_max': PUMA_THREADS,
+        'foreman_database_pool': FOREMAN_DATABASE_POOL,
+        'pulp_api_service_worker_count': pulp_api_workers,
+        'pulp_content_service_worker_count': pulp_content_workers,
+        'pulp_worker_count': pulp_workers,
+        'iop': 'iop' in features,
+    })
+    connections['headroom'] = math.ceil(sum(connections.values()) * CONNECTION_HEADROOM)
+    max_connections = max(100, sum(connections.values()))
+
+    # an eighth of the memory for shared buffers and a quarter as cache, as in the fixed profiles
+    shared_buffers_mb = _clamp(ram_mb // 8 // 256 * 256, 512, 32768)
+    effective_cache_mb = _clamp(ram_mb // 4 // 256 * 256, 1024, 65536)
+
+    # from the httpd default of 400 request workers with 4 CPUs up to the 1024 of the larger profiles from 8 CPUs
+    request_workers = _clamp(400 + (cpus - 4) * 160, 400, 1024) // HTTPD_THREADS_PER_CHILD * HTTPD_THREADS_PER_CHILD
+
+    # parallel dump and restore jobs only help when the disks can seek
+    jobs = _clamp(max(cpus // 4, min(4, cpus // 2)), 2, 12)
+    if rotational:
+        jobs = 2
+    concurrency = 4 if cpus >= 16 and not rotational else 2
+
+    return {
+        'cpus': cpus,
+        'ram_mb': ram_mb,
+        'rotational': rotational,
+        'connections': connections,
+        'foreman_puma_workers': puma_workers,
+        'pulp_worker_count': pulp_workers,
+        'pulp_api_service_worker_count': pulp_api_workers,
+        'pulp_content_service_worker_count': pulp_content_workers,
+        'postgresql_max_connections': max_connections,
+        'postgresql_shared_buffers': _memory(shared_buffers_mb),
+        'postgresql_effective_cache_size': _memory(effective_cache_mb),
+        'candlepin_java_opts_xmx': _memory(int(_clamp(ram_gb // 16, 4, 8)) * 1024, 'm'),
+        'httpd_max_request_workers': request_workers,
+        'httpd_server_limit': request_workers // HTTPD_THREADS_PER_CHILD,
+        'backup_dump_concurrency': concurrency,
+        'backup_dump_jobs': jobs,
+        'restore_database_concurrency': concurrency,
+        'restore_database_jobs': jobs,
+    }
+
+
+class FilterModule(object):
+    '''foremanctl tuning filters'''
+
+    def filters(self):
+        return {
+            'connection_budget': connection_budget,
+            'tuning_plan': tuning_plan,
+        }
@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.basic import missing_required_lib
+
+try:
+    import psycopg2
+    HAS_PSYCOPG2 = True
+except ImportError:
+    HAS_PSYCOPG2 = False
+
+AMCHECK_QUERY = "SELECT COUNT(*) FROM pg_extension WHERE extname = 'amcheck'"
+
+INDEX_QUERY = """
+SELECT c.oid, c.relname, t.relname, c.relpages, i.indisunique, COALESCE(s.n_mod_since_analyze, 0)
+FROM pg_index i
+JOIN pg_opclass op ON i.indclass[0] = op.oid
+JOIN pg_am am ON op.opcmethod = am.oid
+JOIN pg_class c ON i.indexrelid = c.oid
+JOIN pg_class t ON i.indrelid = t.oid
+JOIN pg_namespace n ON c.relnamespace = n.oid
+LEFT JOIN pg_stat_user_tables s ON s.relid = i.indrelid
+WHERE am.amname = 'btree' AND n.nspname = 'public'
+AND c.relpersistence != 't'
+AND c.relkind = 'i' AND i.indisready AND i.indisvalid
+"""
+
+CHECK_QUERY = 'SELECT bt_index_check(index => %s, heapallindexed => %s)'
+
+# query_canceled, raised when statement_timeout cuts a check short
+QUERY_CANCELED = '57014'
+
+
+class CheckFailed(Exception):
+    def __init__(self, status, msg):
+        super().__init__(msg)
+        self.status = status
+
+
+def to_index(row):
+    oid, name, table, pages, unique, modified = row
+    return {'oid': oid, 'name': name, 'table': table, 'pages': pages, 'unique': unique, 'modified': modified}
+
+
+def order_indexes(indexes, order):
+    """Sort indexes largest first, or most modified since the last analyze first."""
+    if order == 'modified':
+        return sorted(indexes, key=lambda index: (-index['modified'], -index['pages'], index['name']))
+    return sorted(indexes, key=lambda index: (-index['pages'], index['name']))
+
+
+def load_cursor(cursor):
+    """Return the cursor passed to the module, or an empty cursor when there is none or it is broken."""
+    try:
+        return {'covered': list(cursor['covered']), 'passes': int(cursor['passes'])}
+    except (ValueError, KeyError, TypeError):
+        return {'covered': [], 'passes': 0}
+
+
+def select_indexes(indexes, order, cursor):
+    """
+    Return the indexes the cursor has not covered yet, in check order.
+
+    Once every index of the database has been covered, a new pass over all
+    of them starts. Indexes dropped since the cursor was written no longer
+    count towards the pass.
+    """
+    names = {index['name'] for index in indexes}
+    cursor['covered'] = [name for name in cursor['covered'] if name in names]
+    remaining = [index for index in indexes if index['name'] not in cursor['covered']]
+    if not remaining:
+        if cursor['covered']:
+            cursor['passes'] += 1
+        cursor['covered'] = []
+        remaining = indexes
+    return order_indexes(remaining, order)
+
+
+def verify_indexes(indexes, connect, parallel, budget=0, clock=time.monotonic):
+    """
+    Check indexes over up to parallel connections.
+
+    connect() returns a checker, called with an index and the seconds left
+    in the budget, that raises CheckFailed. With a budget, no check starts
+    once it is used up and a running check is given only the time left.
+
+    Returns:
+        tuple: (an entry per checked index, indexes left unchecked)
+    """
+    pending = collections.deque(indexes)
+    deadline = clock() + budget if budget else None
+    entries = []
+    lock = threading.Lock()
+
+    def worker():
+        checker = connect()
+        try:
+            while True:
+                with lock:
+                    remaining = deadline - clock() if deadline is not None else None
+                    if not pending or (remaining is not None and remaining <= 0):
+                        return
+                    index = pending.popleft()
+                entry = {'name': index['name'], 'table': index['table'], 'pages': index['pages'], 'status': 'passed'}
+                started = clock()
+                try:
+                    checker(index, remaining)
+                except CheckFailed as e:
+                    entry['status'] = e.status
+                    entry['msg'] = str(e)
+                entry['seconds'] = round(clock() - started, 2)
+                with lock:
+                    entries.append(entry)
+        finally:
+            checker.close()
+
+    workers = max(1, min(parallel, len(indexes)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker) for _ in range(workers)]:
+            future.result()
+    return entries, list(pending)
+
+
+class IndexChecker:
+    """One connection running amcheck on one index at a time."""
+
+    def __init__(self, connection_args):
+        self.connection = psycopg2.connect(**connection_args)
+        self.connection.autocommit = True
+
+    def __call__(self, index, timeout):
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT set_config(%s, %s, false)',
+                           ('statement_timeout', str(max(1, int(timeout * 1000))) if timeout else '0'))
+            try:
+                cursor.execute(CHECK_QUERY, (index['oid'], index['unique']))
+            except psycopg2.Error as e:
+                if e.pgcode == QUERY_CANCELED:
+                    raise CheckFailed('timeout', 'Cancelled when the time budget ran out')
+                raise CheckFailed('corrupted' if (e.pgcode or '').startswith('XX') else 'error',
+                                  (e.pgerror or str(e)).strip())
+
+    def query(self, query):
+        with self.connection.cursor() as cursor:
+            cursor.execute(query)
+            return cursor.fetchall()
+
+    def close(self):
+        self.connection.close()
+
+
+def run_module():
+    module_args = dict(
+        database=dict(type='str', required=True),
+        login_host=dict(type='str', required=False, default='localhost'),
+        login_port=dict(type='int', required=False, default=5432),
+        login_user=dict(type='str', required=False, default='postgres'),
+        login_password=dict(type='str', required=False, default=None, no_log=True),
+        order=dict(type='str', required=False, default='size', choices=['size', 'modified']),
+        budget=dict(type='int', required=False, default=0),
+        parallel=dict(type='int', required=False, default=1),
+        cursor=dict(type='dict', required=False, default=None),
+    )
+
+    result = dict(
+        changed=False,
+        amcheck=False,
+        indexes=[],
+        total=0,
+        checked=0,
+        failed=0,
+        remaining=0,
+        passes=0,
+        cursor=None,
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    if not HAS_PSYCOPG2:
+        module.fail_json(msg=missing_required_lib('psycopg2'), **result)
+
+    connection_args = dict(
+        dbname=module.params['database'],
+        host=module.params['login_host'],
+        port=module.params['login_port'],
+        user=module.params['login_user'],
+        password=module.params['login_password'],
+    )
+    budget = max(0, module.params['budget'])
+
+    try:
+        catalog = IndexChecker(connection_args)
+        try:
+            result['amcheck'] = catalog.query(AMCHECK_QUERY)[0][0] > 0
+            indexes = [to_index(row) for row in catalog.query(INDEX_QUERY)] if result['amcheck'] else []
+        finally:
+            catalog.close()
+
+        if not result['amcheck'] or module.check_mode:
+            module.exit_json(**result)
+
+        # without a budget every index is checked, so the run is a full pass by itself
+        cursor = load_cursor(module.params['cursor']) if budget else {'covered': [], 'passes': 0}
+        selected = select_indexes(indexes, module.params['order'], cursor)
+        entries, unchecked = verify_indexes(selected, lambda: IndexChecker(connection_args),
+                                            module.params['parallel'], budget)
+
+        cursor['covered'].extend(entry['name'] for entry in entries if entry['status'] != 'timeout')
+        complete = len(cursor['covered']) == len(indexes)
+        if complete:
+            cursor['passes'] += 1
+            cursor['covered'] = []
+        if budget:
+            result['cursor'] = cursor
+
+        result['indexes'] = sorted(entries, key=lambda entry: entry['seconds'], reverse=True)
+        result['total'] = len(indexes)
+        result['checked'] = len([entry for entry in entries if entry['status'] != 'timeout'])
+        result['remaining'] = 0 if complete else len(indexes) - len(cursor['covered'])
+        result['passes'] = cursor['passes']
+
+        failed = [entry for entry in entries if entry['status'] in ('corrupted', 'error')]
+        result['failed'] = len(failed)
+        if failed:
+            module.fail_json(msg='; '.join(f"{entry['name']} ({entry['status']}): {entry['msg']}" for entry in failed),
+                             **result)
+
+        module.exit_json(**result)
+
+    except psycopg2.Error as e:
+        module.fail_json(msg=(e.pgerror or str(e)).strip(), **result)
+    except Exception as e:
+        module.fail_json(msg=f"Unexpected error: {e}", **result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
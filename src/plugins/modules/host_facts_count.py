@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.basic import missing_required_lib
+
+try:
+    import psycopg2
+    HAS_PSYCOPG2 = True
+except ImportError:
+    HAS_PSYCOPG2 = False
+
+# The threshold and the row cap are applied by the server, and the host
+# names are only looked up for the rows that are returned.
+OFFENDERS_QUERY = """
+SELECT o.host_id, h.name, o.count, o.total
+FROM (
+    SELECT host_id, count(*) AS count, count(*) OVER () AS total
+    FROM fact_values
+    GROUP BY host_id
+    HAVING count(*) >= %(threshold)s
+    ORDER BY count DESC
+    LIMIT %(limit)s
+) o
+LEFT JOIN hosts h ON h.id = o.host_id
+ORDER BY o.count DESC
+"""
+
+CANDIDATES_QUERY = """
+SELECT o.host_id, h.name, o.count, count(*) OVER ()
+FROM (
+    SELECT host_id, count(*) AS count
+    FROM fact_values
+    WHERE host_id = ANY(%(hosts)s)
+    GROUP BY host_id
+    HAVING count(*) >= %(threshold)s
+) o
+LEFT JOIN hosts h ON h.id = o.host_id
+ORDER BY o.count DESC
+LIMIT %(limit)s
+"""
+
+STATISTICS_QUERY = """
+SELECT c.reltuples, s.most_common_vals::text::bigint[], s.most_common_freqs
+FROM pg_class c
+JOIN pg_stats s ON s.schemaname = 'public' AND s.tablename = c.relname AND s.attname = 'host_id'
+WHERE c.oid = 'public.fact_values'::regclass
+"""
+
+
+def to_offenders(rows):
+    """
+    Turn query rows of (host_id, name, count, total) into offenders.
+
+    Returns:
+        tuple: (number of hosts over the threshold, list of offender dicts)
+    """
+    offenders = [{'host_id': host_id, 'name': name, 'count': count} for host_id, name, count, _total in rows]
+    return (rows[0][3] if rows else 0), offenders
+
+
+def exact_offenders(query, threshold, limit):
+    """Count the facts of every host and return the hosts at or above threshold, at most limit of them."""
+    return to_offenders(query(OFFENDERS_QUERY, {'threshold': threshold, 'limit': limit}))
+
+
+def estimated_offenders(query, threshold, limit):
+    """
+    Find offenders among the most common hosts of the planner statistics.
+
+    The statistics estimate the share of fact_values rows of the most common
+    host_id values. Hosts estimated at half the threshold or more are
+    counted exactly, so only their rows are read. Hosts missing from the
+    statistics, because the table was not analyzed since they gained their
+    facts, are not found.
+
+    Returns None when fact_values has no statistics yet.
+    """
+    rows = query(STATISTICS_QUERY, {})
+    if not rows:
+        return None
+    reltuples, hosts, frequencies = rows[0]
+    if reltuples is None or reltuples <= 0 or not hosts:
+        return None
+    candidates = [host for host, frequency in zip(hosts, frequencies) if frequency * reltuples >= threshold / 2]
+    if not candidates:
+        return 0, []
+    return to_offenders(query(CANDIDATES_QUERY, {'hosts': candidates, 'threshold': threshold, 'limit': limit}))
+
+
+def run_module():
+    module_args = dict(
+        database=dict(type='str', required=True),
+        login_host=dict(type='str', required=False, default='localhost'),
+        login_port=dict(type='int', required=False, default=5432),
+        login_user=dict(type='str', required=True),
+        login_password=dict(type='str', required=False, default=None, no_log=True),
+        threshold=dict(type='int', required=True),
+        limit=dict(type='int', required=False, default=20),
+        estimate=dict(type='bool', required=False, default=False),
+    )
+
+    result = dict(
+        changed=False,
+        over_threshold=0,
+        hosts=[],
+        estimated=False,
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    if not HAS_PSYCOPG2:
+        module.fail_json(msg=missing_required_lib('psycopg2'), **result)
+
+    threshold = module.params['threshold']
+    limit = max(1, module.params['limit'])
+
+    try:
+        connection = psycopg2.connect(dbname=module.params['database'],
+                                      host=module.params['login_host'],
+                                      port=module.params['login_port'],
+                                      user=module.params['login_user'],
+                                      password=module.params['login_password'])
+        try:
+            def query(sql, params):
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    return cursor.fetchall()
+
+            found = estimated_offenders(query, threshold, limit) if module.params['estimate'] else None
+            result['estimated'] = found is not None
+            if found is None:
+                found = exact_offenders(query, threshold, limit)
+        finally:
+            connection.close()
+
+        result['over_threshold'], result['hosts'] = found
+        module.exit_json(**result)
+
+    except psycopg2.Error as e:
+        module.fail_json(msg=(e.pgerror or str(e)).strip(), **result)
+    except Exception as e:
+        module.fail_json(msg=f"Unexpected error: {e}", **result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
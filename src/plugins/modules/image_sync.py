@@ -0,0 +1,334 @@
+#!/usr/bin/python3
+
+import concurrent.futures
+import json
+import os
+import shutil
+import subprocess
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+
+BUNDLE_INDEX = 'foremanctl-images.json'
+QUADLET_GENERATOR = '/usr/lib/systemd/system-generators/podman-system-generator'
+
+
+class CommandError(Exception):
+    pass
+
+
+def make_runner(timeout):
+    """Return a function running a command and returning its stdout, raising CommandError on failure."""
+    def run(argv):
+        try:
+            process = subprocess.run(argv, capture_output=True, text=True, timeout=timeout, check=False)
+        except subprocess.TimeoutExpired:
+            raise CommandError(f"{' '.join(argv)} timed out after {timeout}s")
+        if process.returncode != 0:
+            raise CommandError(process.stderr.strip() or f"{' '.join(argv)} exited with {process.returncode}")
+        return process.stdout
+    return run
+
+
+def quadlet_images(run):
+    """
+    Return the image each generated *-image.service pulls, keyed by unit name.
+
+    The quadlet generator runs in dry-run mode, so this needs no daemon
+    reload. Quadlet has already merged every .image.d drop-in into the
+    generated services, so their ExecStart is the effective image reference.
+    """
+    try:
+        output = run([QUADLET_GENERATOR, '--dryrun'])
+    except (CommandError, OSError):
+        return {}
+    images = {}
+    unit = None
+    # ---foreman-image.service---
+    # ...
+    # ExecStart=/usr/bin/podman image pull IMAGE
+    for line in output.replace('\\\n', ' ').splitlines():
+        if line.startswith('---') and line.endswith('---'):
+            unit = line.strip('-')
+        elif unit and unit.endswith('-image.service') and line.startswith('ExecStart='):
+            argv = line[len('ExecStart='):].split()
+            if argv:
+                images[unit] = argv[-1]
+    return images
+
+
+def local_digests(run, image):
+    """Return the manifest digests the local copy of image was pulled by, empty if it is not present."""
+    try:
+        inspect = json.loads(run(['podman', 'image', 'inspect', '--format', 'json', image]))
+    except CommandError:
+        return set()
+    digests = set()
+    for local in inspect:
+        if local.get('Digest'):
+            digests.add(local['Digest'])
+        digests.update(repo_digest.split('@', 1)[1] for repo_digest in local.get('RepoDigests') or []
+                       if '@' in repo_digest)
+    return digests
+
+
+def remote_manifest(run, image, auth_file=None):
+    """
+    Inspect image in its registry without pulling it.
+
+    Returns:
+        tuple: (manifest digest, dict mapping layer digests to compressed sizes)
+    """
+    argv = ['skopeo', 'inspect', '--no-tags']
+    if auth_file:
+        argv.append(f'--authfile={auth_file}')
+    inspect = json.loads(run(argv + [f'docker://{image}']))
+    layers = {layer['Digest']: layer.get('Size', 0) for layer in inspect.get('LayersData') or []}
+    if not layers:
+        layers = {digest: 0 for digest in inspect.get('Layers') or []}
+    return inspect['Digest'], layers
+
+
+def pull_image(run, image, auth_file=None):
+    argv = ['podman', 'pull', '--quiet']
+    if auth_file:
+        argv.append(f'--authfile={auth_file}')
+    run(argv + [image])
+
+
+def check_images(images, inspect_local, inspect_remote, concurrency, only_missing=False):
+    """
+    Compare local and remote digests of every image, concurrently.
+
+    With only_missing, images present locally are left alone without asking
+    the registry, like the Policy=missing of the image units.
+    """
+    def check(definition):
+        entry = {
+            'name': definition['name'],
+            'image': definition['image'],
+            'digest': None,
+            'layers': {},
+            'changed': False,
+            'bytes': 0,
+            'seconds': 0.0,
+        }
+        try:
+            local = inspect_local(definition['image'])
+            if only_missing and local:
+                return entry
+            entry['digest'], entry['layers'] = inspect_remote(definition['image'])
+            entry['changed'] = entry['digest'] not in local
+        except (CommandError, ValueError, KeyError) as e:
+            entry['failed'] = f"Could not inspect {definition['image']}: {e}"
+        return entry
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(check, images))
+
+
+def pull_changed(entries, pull, concurrency, clock=time.monotonic):
+    """
+    Pull the changed entries, at most concurrency at a time.
+
+    A pull is not started while another pull sharing one of its layers is in
+    flight. It starts once that layer is in local storage instead, so every
+    layer is downloaded once. An entry's bytes are the compressed size of its
+    layers not already fetched by an earlier pull in this run.
+    """
+    pending = [entry for entry in entries if entry['changed'] and 'failed' not in entry]
+    fetched = set()
+    in_flight = {}
+
+    def timed_pull(image):
+        started = clock()
+        pull(image)
+        return round(clock() - started, 2)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while pending or in_flight:
+            busy = set().union(*(set(entry['layers']) for entry in in_flight.values()))
+            for entry in list(pending):
+                if len(in_flight) >= concurrency:
+                    break
+                if busy.isdisjoint(entry['layers']):
+                    pending.remove(entry)
+                    entry['bytes'] = sum(size for digest, size in entry['layers'].items() if digest not in fetched)
+                    fetched.update(entry['layers'])
+                    busy.update(entry['layers'])
+                    in_flight[executor.submit(timed_pull, entry['image'])] = entry
+
+            done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                entry = in_flight.pop(future)
+                try:
+                    entry['seconds'] = future.result()
+                except CommandError as e:
+                    entry['failed'] = f"Could not pull {entry['image']}: {e}"
+    return entries
+
+
+def layout_blobs(layout):
+    """
+    Count the blobs referenced by the images in an OCI layout.
+
+    Returns:
+        tuple: (blob references over all images, distinct blobs, bytes of the distinct blobs)
+    """
+    with open(os.path.join(layout, 'index.json')) as index_file:
+        index = json.load(index_file)
+    references = 0
+    blobs = {}
+    for descriptor in index.get('manifests', []):
+        algorithm, digest = descriptor['digest'].split(':', 1)
+        with open(os.path.join(layout, 'blobs', algorithm, digest)) as manifest_file:
+            manifest = json.load(manifest_file)
+        for blob in [manifest['config']] + manifest.get('layers', []):
+            references += 1
+            blobs[blob['digest']] = blob.get('size', 0)
+    return references, len(blobs), sum(blobs.values())
+
+
+def layout_digests(layout):
+    """Return the manifest digest of every ref name in an OCI layout."""
+    with open(os.path.join(layout, 'index.json')) as index_file:
+        index = json.load(index_file)
+    return {descriptor.get('annotations', {}).get('org.opencontainers.image.ref.name'): descriptor['digest']
+            for descriptor in index.get('manifests', [])}
+
+
+def export_bundle(run, images, path):
+    """
+    Write images from local storage into one OCI layout directory at path.
+
+    Blobs are stored by digest in the layout, so layers shared between
+    images are stored once. The directory is written as is, packing it for
+    transport is left to the user, so importing never needs a second copy.
+    """
+    if os.path.isdir(path) and os.listdir(path):
+        if not os.path.exists(os.path.join(path, BUNDLE_INDEX)):
+            raise ValueError(f"{path} is not empty and not an image bundle")
+        shutil.rmtree(path)
+    for definition in images:
+        run(['skopeo', 'copy', '--quiet',
+             f"containers-storage:{definition['image']}", f"oci:{path}:{definition['name']}"])
+    with open(os.path.join(path, BUNDLE_INDEX), 'w') as bundle_index:
+        json.dump({definition['name']: definition['image'] for definition in images}, bundle_index, indent=2)
+    references, blobs, size = layout_blobs(path)
+    return {'references': references, 'blobs': blobs, 'bytes': size}
+
+
+def import_bundle(run, path, inspect_local):
+    """
+    Load every image of a bundle directory into local storage, skipping images already present with the same digest.
+
+    skopeo copies every image straight from the OCI layout into podman
+    storage, the bundle is read in place.
+    """
+    if not os.path.isdir(path):
+        raise ValueError(f"{path} is not an image bundle directory. Unpack an archived bundle first, "
+                         f"e.g. with mkdir DIR && tar --extract --file={path} --directory=DIR, and import DIR")
+    with open(os.path.join(path, BUNDLE_INDEX)) as bundle_index:
+        images = json.load(bundle_index)
+    digests = layout_digests(path)
+    entries = []
+    for name, image in images.items():
+        entry = {'name': name, 'image': image, 'digest': digests.get(name), 'changed': False, 'seconds': 0.0}
+        if entry['digest'] not in inspect_local(image):
+            started = time.monotonic()
+            run(['skopeo', 'copy', '--quiet', f'oci:{path}:{name}', f'containers-storage:{image}'])
+            entry['seconds'] = round(time.monotonic() - started, 2)
+            entry['changed'] = True
+        entries.append(entry)
+    return entries
+
+
+def run_module():
+    module_args = dict(
+        images=dict(type='list', elements='dict', required=False, default=[]),
+        concurrency=dict(type='int', required=False, default=4),
+        auth_file=dict(type='path', required=False, default=None),
+        timeout=dict(type='int', required=False, default=600),
+        path=dict(type='path', required=False, default=None),
+        state=dict(type='str', required=False, default='pulled', choices=['pulled', 'exported', 'imported']),
+        policy=dict(type='str', required=False, default='newer', choices=['newer', 'missing']),
+    )
+
+    result = dict(
+        changed=False,
+        images=[],
+        pulled=0,
+        unchanged=0,
+        bytes=0,
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_if=[
+            ('state', 'pulled', ['images']),
+            ('state', 'exported', ['images', 'path']),
+            ('state', 'imported', ['path']),
+        ],
+        supports_check_mode=True
+    )
+
+    run = make_runner(module.params['timeout'])
+    auth_file = module.params['auth_file']
+    concurrency = max(1, module.params['concurrency'])
+
+    try:
+        units = quadlet_images(run) if module.params['images'] else {}
+        images = [{'name': definition['name'], 'image': units.get(f"{definition['name']}-image.service") or definition['image']}
+                  for definition in module.params['images']]
+
+        if module.params['state'] == 'exported':
+            result['images'] = images
+            if not module.check_mode:
+                result.update(export_bundle(run, images, module.params['path']))
+            result['changed'] = True
+            module.exit_json(**result)
+
+        if module.params['state'] == 'imported':
+            if not module.check_mode:
+                result['images'] = import_bundle(run, module.params['path'], lambda image: local_digests(run, image))
+            result['pulled'] = len([entry for entry in result['images'] if entry['changed']])
+            result['unchanged'] = len(result['images']) - result['pulled']
+            result['changed'] = result['pulled'] > 0
+            module.exit_json(**result)
+
+        entries = check_images(images,
+                               lambda image: local_digests(run, image),
+                               lambda image: remote_manifest(run, image, auth_file),
+                               concurrency,
+                               only_missing=module.params['policy'] == 'missing')
+        if not module.check_mode:
+            pull_changed(entries, lambda image: pull_image(run, image, auth_file), concurrency)
+
+        for entry in entries:
+            del entry['layers']
+        result['images'] = entries
+        result['pulled'] = len([entry for entry in entries if entry['changed'] and 'failed' not in entry])
+        result['unchanged'] = len([entry for entry in entries if not entry['changed'] and 'failed' not in entry])
+        result['bytes'] = sum(entry['bytes'] for entry in entries)
+        result['changed'] = result['pulled'] > 0
+
+        failed = [entry['failed'] for entry in entries if 'failed' in entry]
+        if failed:
+            module.fail_json(msg='; '.join(failed), **result)
+
+        module.exit_json(**result)
+
+    except CommandError as e:
+        module.fail_json(msg=str(e), **result)
+    except (OSError, KeyError, ValueError) as e:
+        module.fail_json(msg=str(e), **result)
+    except Exception as e:
+        module.fail_json(msg=f"Unexpected error: {e}", **result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+
+import hashlib
+import json
+
+from ansible.module_utils.basic import AnsibleModule
+
+DIGEST_LABEL = 'foremanctl.digest'
+SCOPE_LABEL = 'foremanctl.scope'
+
+
+class CommandError(Exception):
+    pass
+
+
+def desired_secrets(secrets, scope=None, read_file=None):
+    """
+    Resolve the content of every secret and the labels it is created with.
+
+    The sha256 of the content is stored in a label, so a later run can tell
+    whether a secret changed from the listing alone, without reading it back.
+
+    Returns:
+        dict: secret name to a dict of content (bytes) and labels
+    """
+    desired = {}
+    for secret in secrets:
+        if secret.get('path') is not None:
+            content = read_file(secret['path'])
+        else:
+            content = (secret.get('data') or '').encode()
+        labels = {str(key): str(value) for key, value in (secret.get('labels') or {}).items()}
+        labels[DIGEST_LABEL] = hashlib.sha256(content).hexdigest()
+        if scope:
+            labels[SCOPE_LABEL] = scope
+        desired[secret['name']] = {'content': content, 'labels': labels}
+    return desired
+
+
+def existing_secrets(listing):
+    """Return the labels of every secret of a podman secret ls --format json listing, by name."""
+    existing = {}
+    for secret in json.loads(listing or '[]') or []:
+        spec = secret.get('Spec') or {}
+        name = spec.get('Name') or secret.get('Name')
+        if name:
+            existing[name] = spec.get('Labels') or secret.get('Labels') or {}
+    return existing
+
+
+def plan_secrets(desired, existing, scope=None):
+    """
+    Compare the desired secrets with the existing ones.
+
+    A secret is updated when its content or labels differ. Secrets created
+    before this module tracked digests are updated once. With a scope, the
+    existing secrets of that scope which are no longer desired are removed;
+    secrets of other scopes or without one are never touched.
+
+    Returns:
+        dict: lists of secret names to create, update and remove
+    """
+    plan = {'created': [], 'updated': [], 'removed': []}
+    for name, secret in desired.items():
+        if name not in existing:
+            plan['created'].append(name)
+        elif existing[name] != secret['labels']:
+            plan['updated'].append(name)
+    if scope:
+        plan['removed'] = sorted(name for name, labels in existing.items()
+                                 if labels.get(SCOPE_LABEL) == scope and name not in desired)
+    return plan
+
+
+def apply_plan(run, plan, desired, executable='podman'):
+    for name in plan['created'] + plan['updated']:
+        argv = [executable, 'secret', 'create']
+        if name in plan['updated']:
+            argv.append('--replace')
+        for key, value in sorted(desired[name]['labels'].items()):
+            argv.append(f'--label={key}={value}')
+        run(argv + [name, '-'], desired[name]['content'])
+    if plan['removed']:
+        run([executable, 'secret', 'rm'] + plan['removed'])
+
+
+def run_module():
+    module_args = dict(
+        secrets=dict(type='list', elements='dict', required=True, options=dict(
+            name=dict(type='str', required=True),
+            data=dict(type='str', required=False, no_log=True),
+            path=dict(type='path', required=False),
+            labels=dict(type='dict', required=False, default={}),
+        ), mutually_exclusive=[('data', 'path')], required_one_of=[('data', 'path')]),
+        scope=dict(type='str', required=False, default=None),
+        executable=dict(type='str', required=False, default='podman'),
+    )
+
+    result = dict(
+        changed=False,
+        created=[],
+        updated=[],
+        removed=[],
+        changed_secrets=[],
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    executable = module.get_bin_path(module.params['executable'], required=True)
+
+    def run(argv, data=None):
+        rc, stdout, stderr = module.run_command(argv, data=data, binary_data=True)
+        if rc != 0:
+            raise CommandError(stderr.strip() or f"{' '.join(argv)} exited with {rc}")
+        return stdout
+
+    def read_file(path):
+        with open(path, 'rb') as secret_file:
+            return secret_file.read()
+
+    scope = module.params['scope']
+    try:
+        desired = desired_secrets(module.params['secrets'], scope, read_file)
+        plan = plan_secrets(desired, existing_secrets(run([executable, 'secret', 'ls', '--format', 'json'])), scope)
+        if not module.check_mode:
+            apply_plan(run, plan, desired, executable)
+    except OSError as e:
+        module.fail_json(msg=f"Could not read secret: {e}", **result)
+    except (CommandError, ValueError) as e:
+        module.fail_json(msg=str(e), **result)
+
+    result.update(plan)
+    result['changed_secrets'] = sorted(plan['created'] + plan['updated'] + plan['removed'])
+    result['changed'] = bool(result['changed_secrets'])
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+
+import gzip
+import json
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+
+
+def scan_tree(root, include, exclude):
+    """
+    Walk the included top-level entries below root.
+
+    Symlinks, to files or to directories, are recorded as entries of their
+    own and not followed, the same as tar archives them.
+
+    Returns a dict mapping paths relative to root to (size, mtime_ns).
+    """
+    excluded = {os.path.normpath(path) for path in exclude}
+    entries = {}
+    for top in include:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, top)):
+            rel_dir = os.path.relpath(dirpath, root)
+            dirnames[:] = [d for d in dirnames if os.path.join(rel_dir, d) not in excluded]
+            # os.walk lists symlinks to directories with the directories without descending into them
+            links = [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]
+            dirnames[:] = [d for d in dirnames if d not in links]
+            for filename in filenames + links:
+                rel_path = os.path.join(rel_dir, filename)
+                if rel_path in excluded:
+                    continue
+                stat = os.lstat(os.path.join(dirpath, filename))
+                entries[rel_path] = (stat.st_size, stat.st_mtime_ns)
+    return entries
+
+
+def write_manifest(file_path, entries):
+    """Write entries as gzip-compressed JSON lines of [path, size, mtime_ns]."""
+    with gzip.open(file_path, 'wt', encoding='utf-8') as f:
+        for rel_path in sorted(entries):
+            size, mtime_ns = entries[rel_path]
+            f.write(json.dumps([rel_path, size, mtime_ns]) + '\n')
+
+
+def read_manifest(file_path):
+    """Read a manifest written by write_manifest."""
+    entries = {}
+    with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            rel_path, size, mtime_ns = json.loads(line)
+            entries[rel_path] = (size, mtime_ns)
+    return entries
+
+
+def diff_manifests(current, previous):
+    """
+    Compare two manifests.
+
+    Returns:
+        tuple: (paths that are new or changed in current, paths that are gone from current)
+    """
+    changed = sorted(path for path, entry in current.items() if previous.get(path) != entry)
+    removed = sorted(path for path in previous if path not in current)
+    return changed, removed
+
+
+def write_file_list(file_path, paths):
+    """Write a NUL separated list of paths, as read by tar --null --files-from."""
+    with open(file_path, 'wb') as f:
+        for path in paths:
+            f.write(os.fsencode(path) + b'\0')
+
+
+def prune_tree(root, include, exclude, entries, check_mode=False):
+    """
+    Remove files below root that are not listed in entries.
+
+    Symlinks are never removed, older manifests did not record symlinks to
+    directories although the archives contain them.
+    """
+    extra = sorted(path for path in scan_tree(root, include, exclude)
+                   if path not in entries and not os.path.islink(os.path.join(root, path)))
+    if not check_mode:
+        for path in extra:
+            os.unlink(os.path.join(root, path))
+    return extra
+
+
+def run_module():
+    module_args = dict(
+        path=dict(type='path', required=True),
+        manifest=dict(type='path', required=True),
+        previous_manifest=dict(type='path', required=False, default=None),
+        changed_list=dict(type='path', required=False, default=None),
+        include=dict(type='list', elements='str', required=False, default=['media']),
+        exclude=dict(type='list', elements='str', required=False, default=[]),
+        state=dict(type='str', required=False, default='present', choices=['present', 'pruned']),
+    )
+
+    result = dict(
+        changed=False,
+        files=0,
+        bytes=0,
+        changed_files=0,
+        changed_bytes=0,
+        removed_files=0,
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    path = module.params['path']
+    include = module.params['include']
+    exclude = module.params['exclude']
+
+    try:
+        if module.params['state'] == 'pruned':
+            entries = read_manifest(module.params['manifest'])
+            removed = prune_tree(path, include, exclude, entries, module.check_mode)
+            result['files'] = len(entries)
+            result['bytes'] = sum(size for size, _mtime in entries.values())
+            result['removed_files'] = len(removed)
+            result['changed'] = bool(removed)
+            module.exit_json(**result)
+
+        entries = scan_tree(path, include, exclude)
+        if module.params['previous_manifest']:
+            previous = read_manifest(module.params['previous_manifest'])
+            changed, removed = diff_manifests(entries, previous)
+        else:
+            changed, removed = sorted(entries), []
+
+        result['files'] = len(entries)
+        result['bytes'] = sum(size for size, _mtime in entries.values())
+        result['changed_files'] = len(changed)
+        result['changed_bytes'] = sum(entries[rel_path][0] for rel_path in changed)
+        result['removed_files'] = len(removed)
+        result['changed'] = True
+
+        if not module.check_mode:
+            write_manifest(module.params['manifest'], entries)
+            if module.params['changed_list']:
+                write_file_list(module.params['changed_list'], changed)
+
+        module.exit_json(**result)
+
+    except (OSError, ValueError) as e:
+        module.fail_json(msg=str(e), **result)
+    except Exception as e:
+        module.fail_json(msg=f"Unexpected error: {e}", **result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/python3
+
+import concurrent.futures
+import socket
+import subprocess
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+
+UNIT_TYPES = ('service', 'socket', 'target', 'timer', 'path', 'mount')
+
+
+class StartupError(Exception):
+    pass
+
+
+def unit_name(name):
+    """Return the full unit name, systemctl assumes .service for names without a unit type."""
+    return name if name.rsplit('.', 1)[-1] in UNIT_TYPES else f'{name}.service'
+
+
+def parse_show(output):
+    """Split systemctl show output for several units into one dict of properties per unit, in order."""
+    units = []
+    for block in output.strip().split('\n\n'):
+        properties = {}
+        for line in block.splitlines():
+            key, _, value = line.partition('=')
+            properties[key] = value
+        units.append(properties)
+    return units
+
+
+def dependency_graph(units, properties):
+    """
+    Return the units each unit has to wait for, among the units being started.
+
+    Only After= orders units, systemd starts a unit it Wants= without After=
+    at the same time too. The quadlets pair both, so the After= entries are
+    the dependency graph. Units outside of the started set are left to systemd.
+    """
+    graph = {}
+    for unit, unit_properties in zip(units, properties):
+        after = set(unit_properties.get('After', '').split())
+        graph[unit] = sorted(after & set(units) - {unit})
+    return graph
+
+
+def start_order(graph):
+    """Return the units in an order where each comes after its dependencies, raising StartupError on a cycle."""
+    order = []
+    visiting = set()
+    visited = set()
+
+    def visit(unit, chain):
+        if unit in visited:
+            return
+        if unit in visiting:
+            raise StartupError(f"Dependency cycle: {' -> '.join(chain + [unit])}")
+        visiting.add(unit)
+        for dependency in graph[unit]:
+            visit(dependency, chain + [unit])
+        visiting.discard(unit)
+        visited.add(unit)
+        order.append(unit)
+
+    for unit in graph:
+        visit(unit, [])
+    return order
+
+
+def run_startup(graph, bring_up, concurrency, clock=time.monotonic):
+    """
+    Bring up every unit of graph as soon as the units it is ordered after are ready.
+
+    bring_up(unit) starts the unit and returns once it is ready, raising
+    StartupError when it does not become ready. Independent units are
+    brought up in parallel. Units depending on a unit that failed are skipped.
+
+    Returns:
+        dict: unit to its state (ready, failed or skipped), msg, and the
+        started and ready times in seconds since the start of the run
+    """
+    order = start_order(graph)
+    begin = clock()
+    results = {}
+
+    def timed(unit):
+        started = clock() - begin
+        try:
+            bring_up(unit)
+        except StartupError as e:
+            return {'state': 'failed', 'msg': str(e), 'started': round(started, 2), 'ready': None}
+        return {'state': 'ready', 'msg': '', 'started': round(started, 2), 'ready': round(clock() - begin, 2)}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        running = {}
+        pending = list(order)
+        while pending or running:
+            for unit in list(pending):
+                states = {dependency: results.get(dependency, {}).get('state') for dependency in graph[unit]}
+                failed = [dependency for dependency, state in states.items() if state in ('failed', 'skipped')]
+                if failed:
+                    results[unit] = {'state': 'skipped', 'msg': f"{', '.join(failed)} did not become ready",
+                                     'started': None, 'ready': None}
+                    pending.remove(unit)
+                elif all(state == 'ready' for state in states.values()):
+                    running[executor.submit(timed, unit)] = unit
+                    pending.remove(unit)
+            if not running:
+                continue
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+def critical_path(graph, results):
+    """Return the chain of units that determined when the last unit was ready, first unit first."""
+    ready = {unit: result['ready'] for unit, result in results.items() if result['ready'] is not None}
+    if not ready:
+        return []
+    path = [max(ready, key=ready.get)]
+    while True:
+        dependencies = [d for d in graph[path[-1]] if d in ready]
+        if not dependencies:
+            return list(reversed(path))
+        path.append(max(dependencies, key=ready.get))
+
+
+def connect(address, timeout):
+    """Open and close a connection to a host:port or unix socket path."""
+    if address.startswith('/'):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as unix_socket:
+            unix_socket.settimeout(timeout)
+            unix_socket.connect(address)
+    else:
+        host, _, port = address.rpartition(':')
+        socket.create_connection((host.strip('[]'), int(port)), timeout=timeout).close()
+
+
+def wait_for_socket(address, deadline, connect=connect, clock=time.monotonic, sleep=time.sleep):
+    """
+    Connect to address until it accepts a connection or the deadline passes.
+
+    A refused connection returns at once, so the retries back off from 50ms
+    to at most a second instead of sleeping a fixed delay.
+    """
+    backoff = 0.05
+    while True:
+        try:
+            connect(address, max(0.1, min(5, deadline - clock())))
+            return
+        except OSError as e:
+            if clock() + backoff > deadline:
+                raise StartupError(f"{address} did not accept connections: {e}")
+        sleep(backoff)
+        backoff = min(backoff * 2, 1)
+
+
+def make_bring_up(services, action, deadline_for, run):
+    """Return a function starting a unit and waiting for the readiness probes of its service entry."""
+    def bring_up(unit):
+        service = services[unit]
+        deadline = deadline_for()
+        # For Type=notify units, including podman's sdnotify=healthy, the
+        # start job only finishes once the service sent READY=1.
+        run(['systemctl', action, unit], deadline)
+        if service.get('container'):
+            run(['podman', 'wait', '--condition=healthy', service['container']], deadline)
+        if service.get('socket'):
+            wait_for_socket(service['socket'], deadline)
+    return bring_up
+
+
+def make_runner(clock=time.monotonic):
+    def run(argv, deadline):
+        try:
+            process = subprocess.run(argv, capture_output=True, text=True, check=False,
+                                     timeout=max(1, deadline - clock()))
+        except subprocess.TimeoutExpired:
+            raise StartupError(f"{' '.join(argv)} timed out")
+        if process.returncode != 0:
+            raise StartupError(process.stderr.strip() or f"{' '.join(argv)} exited with {process.returncode}")
+        return process.stdout
+    return run
+
+
+def normalize_services(services):
+    """Turn the services option, names or dicts, into a dict of full unit names to service entries."""
+    normalized = {}
+    for service in services:
+        if isinstance(service, str):
+            service = {'name': service}
+        if not isinstance(service, dict) or not service.get('name'):
+            raise StartupError(f"Invalid service entry {service!r}, expected a name or a dict with a name")
+        address = service.get('socket') or '/'
+        if not address.startswith('/') and not address.rpartition(':')[2].isdigit():
+            raise StartupError(f"Invalid socket {address!r} of {service['name']}, expected host:port or a path")
+        normalized[unit_name(service['name'])] = service
+    return normalized
+
+
+def run_module():
+    module_args = dict(
+        services=dict(type='list', elements='raw', required=True),
+        state=dict(type='str', required=False, default='started', choices=['started', 'restarted']),
+        timeout=dict(type='int', required=False, default=300),
+        concurrency=dict(type='int', required=False, default=8),
+    )
+
+    result = dict(
+        changed=False,
+        services=[],
+        critical_path=[],
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    run = make_runner()
+    try:
+        services = normalize_services(module.params['services'])
+        units = list(services)
+        properties = parse_show(run(['systemctl', 'show', '--property=After,ActiveState'] + units,
+                                    time.monotonic() + 30))
+        graph = dependency_graph(units, properties)
+        start_order(graph)
+    except StartupError as e:
+        module.fail_json(msg=str(e), **result)
+
+    inactive = [unit for unit, unit_properties in zip(units, properties) if unit_properties.get('ActiveState') != 'active']
+    result['changed'] = module.params['state'] == 'restarted' or bool(inactive)
+    if module.check_mode or not result['changed']:
+        module.exit_json(**result)
+
+    action = 'restart' if module.params['state'] == 'restarted' else 'start'
+    timeout = module.params['timeout']
+    results = run_startup(graph, make_bring_up(services, action, lambda: time.monotonic() + timeout, run),
+                          module.params['concurrency'])
+
+    result['services'] = [dict(name=unit, seconds=round(results[unit]['ready'] - results[unit]['started'], 2)
+                               if results[unit]['ready'] is not None else None, **results[unit])
+                          for unit in sorted(results, key=lambda unit: (results[unit]['ready'] is None,
+                                                                        results[unit]['ready'] or 0))]
+    result['critical_path'] = critical_path(graph, results)
+
+    failed = [service for service in result['services'] if service['state'] != 'ready']
+    if failed:
+        module.fail_json(msg='Services did not become ready: ' + '; '.join(
+            f"{service['name']} {service['state']}: {service['msg']}" for service in failed), **result)
+
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
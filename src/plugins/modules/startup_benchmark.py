@@ -0,0 +1,212 @@
+#!/usr/bin/python3
+
+import subprocess
+import threading
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.urls import open_url
+
+# Properties read for every unit the target pulls in, timestamps are CLOCK_MONOTONIC microseconds.
+UNIT_PROPERTIES = 'Id,After,ActiveState,InactiveExitTimestampMonotonic,ActiveEnterTimestampMonotonic'
+
+
+class CommandError(Exception):
+    pass
+
+
+def parse_dependencies(output):
+    """Return the unit names of systemctl list-dependencies --plain --no-legend output."""
+    units = []
+    for line in output.splitlines():
+        name = line.strip().lstrip('●○').strip()
+        if name and name not in units:
+            units.append(name)
+    return units
+
+
+def parse_show(output):
+    """Split systemctl show output for several units into one dict of properties per unit."""
+    units = []
+    for block in output.strip().split('\n\n'):
+        properties = {}
+        for line in block.splitlines():
+            key, _, value = line.partition('=')
+            properties[key] = value
+        units.append(properties)
+    return units
+
+
+def unit_timings(properties, since):
+    """
+    Return when every unit started activating and became active, in seconds after since.
+
+    since is the CLOCK_MONOTONIC time in microseconds the target was started
+    at. Units that were already active before, like the system targets the
+    quadlets are ordered after, are left out.
+
+    Returns:
+        dict: unit name to a dict of started, ready (None if it did not
+        become active), seconds it took and the units it is ordered after
+    """
+    timings = {}
+    for unit in properties:
+        activating = int(unit.get('InactiveExitTimestampMonotonic') or 0)
+        active = int(unit.get('ActiveEnterTimestampMonotonic') or 0)
+        if activating < since and active < since:
+            continue
+        started = round((max(activating, since) - since) / 1e6, 3)
+        # units without an activating phase, like targets, enter active right away
+        ready = round((active - since) / 1e6, 3) if active >= since and unit.get('ActiveState') == 'active' else None
+        timings[unit['Id']] = {
+            'started': started,
+            'ready': ready,
+            'seconds': round(ready - started, 3) if ready is not None else None,
+            'after': unit.get('After', '').split(),
+        }
+    return timings
+
+
+def critical_chain(timings, target):
+    """
+    Follow the units the target waited for, like systemd-analyze critical-chain.
+
+    From the target, every step goes to the unit it is ordered after that
+    became active last, but not after the unit itself started activating.
+
+    Returns:
+        list: dicts of name, ready and seconds, first unit first
+    """
+    chain = []
+    unit = target
+    while unit in timings and timings[unit]['ready'] is not None:
+        chain.append({'name': unit, 'ready': timings[unit]['ready'], 'seconds': timings[unit]['seconds']})
+        started = timings[unit]['started']
+        candidates = [after for after in timings[unit]['after']
+                      if after in timings and timings[after]['ready'] is not None
+                      and timings[after]['ready'] <= started + 0.001 and after not in [c['name'] for c in chain]]
+        if not candidates:
+            break
+        unit = max(candidates, key=lambda after: timings[after]['ready'])
+    return list(reversed(chain))
+
+
+def wait_for_endpoints(endpoints, answers, begin, deadline, done, interval=0.5, clock=time.monotonic, sleep=time.sleep):
+    """
+    Request every endpoint until it answers with HTTP 200 or the deadline passes.
+
+    answers(endpoint) returns whether the endpoint answered. done() tells
+    whether starting the target finished; the endpoints are still probed
+    after it did, services can answer later than their units got active.
+
+    Returns:
+        dict: endpoint name to the seconds after begin it first answered, None if it never did
+    """
+    answered = {endpoint['name']: None for endpoint in endpoints}
+    while True:
+        for endpoint in endpoints:
+            if answered[endpoint['name']] is None and answers(endpoint):
+                answered[endpoint['name']] = round(clock() - begin, 3)
+        if all(seconds is not None for seconds in answered.values()) and done():
+            return answered
+        if clock() + interval > deadline:
+            return answered
+        sleep(interval)
+
+
+def run_module():
+    module_args = dict(
+        target=dict(type='str', required=False, default='foreman.target'),
+        endpoints=dict(type='list', elements='dict', required=False, default=[], options=dict(
+            name=dict(type='str', required=True),
+            url=dict(type='str', required=True),
+        )),
+        validate_certs=dict(type='bool', required=False, default=True),
+        ca_path=dict(type='path', required=False, default=None),
+        timeout=dict(type='int', required=False, default=900),
+        interval=dict(type='float', required=False, default=0.5),
+    )
+
+    result = dict(
+        changed=False,
+        target=None,
+        usable=None,
+        endpoints={},
+        units=[],
+        critical_chain=[],
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=False
+    )
+
+    systemctl = module.get_bin_path('systemctl', required=True)
+    target = module.params['target']
+
+    def run(argv):
+        rc, stdout, stderr = module.run_command(argv)
+        if rc != 0:
+            raise CommandError(stderr.strip() or f"{' '.join(argv)} exited with {rc}")
+        return stdout
+
+    def answers(endpoint):
+        try:
+            response = open_url(endpoint['url'], timeout=5, validate_certs=module.params['validate_certs'],
+                                ca_path=module.params['ca_path'])
+            return response.status == 200
+        except Exception:  # refused, reset, 502/503 from httpd while the backend starts
+            return False
+
+    try:
+        run([systemctl, 'stop', target])
+        result['changed'] = True
+
+        begin = time.monotonic()
+        since = time.clock_gettime_ns(time.CLOCK_MONOTONIC) // 1000
+        deadline = begin + module.params['timeout']
+        start = {}
+
+        def start_target():
+            try:
+                start['process'] = subprocess.run([systemctl, 'start', target], capture_output=True, text=True,
+                                                  timeout=module.params['timeout'], check=False)
+            except subprocess.TimeoutExpired:
+                start['timeout'] = True
+
+        starter = threading.Thread(target=start_target, daemon=True)
+        starter.start()
+        result['endpoints'] = wait_for_endpoints(module.params['endpoints'], answers, begin, deadline,
+                                                 lambda: not starter.is_alive(), module.params['interval'])
+        starter.join(max(0, deadline - time.monotonic()))
+
+        units = parse_dependencies(run([systemctl, 'list-dependencies', '--plain', '--no-legend', '--no-pager', target]))
+        timings = unit_timings(parse_show(run([systemctl, 'show', f'--property={UNIT_PROPERTIES}'] + units)), since)
+    except CommandError as e:
+        module.fail_json(msg=str(e), **result)
+
+    result['units'] = sorted(({'name': name, 'started': timing['started'], 'ready': timing['ready'],
+                               'seconds': timing['seconds']} for name, timing in timings.items()),
+                             key=lambda unit: (unit['ready'] is None, unit['ready'] or 0))
+    result['critical_chain'] = critical_chain(timings, target)
+    result['target'] = timings.get(target, {}).get('ready')
+    if result['target'] is not None and all(seconds is not None for seconds in result['endpoints'].values()):
+        result['usable'] = max([result['target']] + list(result['endpoints'].values()))
+
+    if start.get('timeout') or starter.is_alive():
+        module.fail_json(msg=f"Starting {target} did not finish within {module.params['timeout']}s", **result)
+    if start['process'].returncode != 0:
+        module.fail_json(msg=start['process'].stderr.strip() or f"Starting {target} failed", **result)
+    missing = [name for name, seconds in result['endpoints'].items() if seconds is None]
+    if missing:
+        module.fail_json(msg=f"{', '.join(missing)} did not answer within {module.params['timeout']}s", **result)
+
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+
+# read and cleared by systemd_reload with restart=true
+DEFAULT_MARKS = '/run/foremanctl/restart'
+UNIT_TYPES = ('service', 'socket', 'target', 'timer', 'path', 'mount')
+
+
+def unit_name(name):
+    """Return the full unit name, systemctl assumes .service for names without a unit type."""
+    return name if name.rsplit('.', 1)[-1] in UNIT_TYPES else f'{name}.service'
+
+
+def mark_units(marks, units):
+    """
+    Mark units for a restart by the next systemd_reload barrier, returning the units that were not marked yet.
+
+    A mark is an empty file named after the unit. Marks live in /run, so
+    the marks of an interrupted deploy are restarted by the next one, while
+    a reboot, which starts every unit anyway, drops them.
+    """
+    os.makedirs(marks, mode=0o755, exist_ok=True)
+    marked = []
+    for unit in units:
+        path = os.path.join(marks, unit)
+        if not os.path.exists(path):
+            with open(path, 'w'):
+                pass
+            marked.append(unit)
+    return marked
+
+
+def run_module():
+    module_args = dict(
+        units=dict(type='list', elements='str', required=True),
+        marks=dict(type='path', required=False, default=DEFAULT_MARKS),
+    )
+
+    result = dict(
+        changed=False,
+        units=[],
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    units = [unit_name(unit) for unit in module.params['units']]
+    invalid = [unit for unit in units if '/' in unit]
+    if invalid:
+        module.fail_json(msg=f"Invalid unit names: {', '.join(invalid)}", **result)
+
+    if module.check_mode:
+        result['units'] = [unit for unit in units if not os.path.exists(os.path.join(module.params['marks'], unit))]
+    else:
+        try:
+            result['units'] = mark_units(module.params['marks'], units)
+        except OSError as e:
+            module.fail_json(msg=f"Could not mark units in {module.params['marks']}: {e}", **result)
+    result['changed'] = bool(result['units'])
+
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
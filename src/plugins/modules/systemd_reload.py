@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+
+DEFAULT_PATHS = ['/etc/containers/systemd', '/etc/systemd/system']
+DEFAULT_STAMP = '/run/foremanctl/systemd-reload'
+# written by systemd_mark_restart
+DEFAULT_MARKS = '/run/foremanctl/restart'
+
+
+def changed_units(paths, since):
+    """
+    Return the unit files, drop-ins and directories under paths modified at or after since.
+
+    since is the st_mtime_ns of the stamp written by the last reload. A
+    removed unit shows up as a modification of its directory. Symlinks, like
+    the dynflow-sidekiq@ instances, are not followed, their own modification
+    time counts.
+    """
+    changed = []
+    for root in paths:
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            candidates = [directory] + [os.path.join(directory, name) for name in sorted(filenames)]
+            for path in candidates:
+                try:
+                    modified = os.lstat(path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                if modified >= since:
+                    changed.append(path)
+    return changed
+
+
+def stamp_time(stamp):
+    """Return the st_mtime_ns of the stamp, None when no reload was recorded since boot."""
+    try:
+        return os.stat(stamp).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def write_stamp(stamp):
+    os.makedirs(os.path.dirname(stamp), mode=0o755, exist_ok=True)
+    with open(stamp, 'w'):
+        pass
+    os.utime(stamp)
+
+
+def marked_units(marks):
+    """Return the units marked for a restart, in name order."""
+    try:
+        return sorted(os.listdir(marks))
+    except FileNotFoundError:
+        return []
+
+
+def clear_marks(marks, units):
+    """Remove the marks of units, once they were restarted or found not running."""
+    for unit in units:
+        try:
+            os.unlink(os.path.join(marks, unit))
+        except FileNotFoundError:
+            pass
+
+
+def active_units(units, show_output):
+    """
+    Return the units that are active, given the systemctl show --property=ActiveState output for units.
+
+    Units that are not running are left to the roles that start them, so a
+    first deploy does not start services before their databases exist.
+    """
+    states = [block.partition('=')[2].strip() for block in show_output.strip().split('\n\n')]
+    return [unit for unit, state in zip(units, states) if state == 'active']
+
+
+def run_module():
+    module_args = dict(
+        paths=dict(type='list', elements='path', required=False, default=DEFAULT_PATHS),
+        stamp=dict(type='path', required=False, default=DEFAULT_STAMP),
+        force=dict(type='bool', required=False, default=False),
+        restart=dict(type='bool', required=False, default=False),
+        marks=dict(type='path', required=False, default=DEFAULT_MARKS),
+    )
+
+    result = dict(
+        changed=False,
+        units=[],
+        restarted=[],
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    # The stamp lives in /run, so the first reload after a boot, when the
+    # generators ran anyway, is always done.
+    since = stamp_time(module.params['stamp'])
+    if since is not None:
+        result['units'] = changed_units(module.params['paths'], since)
+
+    reload = module.params['force'] or since is None or bool(result['units'])
+    systemctl = module.get_bin_path('systemctl', required=True)
+
+    if reload:
+        result['changed'] = True
+        if not module.check_mode:
+            try:
+                # written before reloading, so units written while the generators run are seen by the next barrier
+                write_stamp(module.params['stamp'])
+            except OSError as e:
+                module.fail_json(msg=f"Could not write {module.params['stamp']}: {e}", **result)
+            rc, _stdout, stderr = module.run_command([systemctl, 'daemon-reload'])
+            if rc != 0:
+                os.unlink(module.params['stamp'])
+                module.fail_json(msg=stderr.strip() or f"systemctl daemon-reload exited with {rc}", **result)
+
+    marked = marked_units(module.params['marks']) if module.params['restart'] else []
+    if marked:
+        rc, stdout, stderr = module.run_command([systemctl, 'show', '--property=ActiveState', '--'] + marked)
+        if rc != 0:
+            module.fail_json(msg=stderr.strip() or f"systemctl show exited with {rc}", **result)
+        result['restarted'] = active_units(marked, stdout)
+        result['changed'] = result['changed'] or bool(result['restarted'])
+        if not module.check_mode:
+            # one job per unit in a single transaction, ordered by the After= of the units
+            if result['restarted']:
+                rc, _stdout, stderr = module.run_command([systemctl, 'restart', '--'] + result['restarted'])
+                if rc != 0:
+                    module.fail_json(msg=stderr.strip() or f"systemctl restart exited with {rc}", **result)
+            clear_marks(module.params['marks'], marked)
+
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/python3
+"""
+Write metrics about the Foreman services in the Prometheus text format.
+
+The file is meant for the textfile collector of node_exporter. It is
+rewritten atomically on every run, so scrapes only read a small file and
+never reach the services or databases themselves.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import time
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+DATABASE_QUERY = """
+SELECT pg_database_size(current_database()),
+       (SELECT count(*) FROM pg_stat_activity WHERE datname = current_database())
+"""
+
+FOREMAN_TASKS_QUERY = """
+SELECT state, result, count(*)
+FROM foreman_tasks_tasks
+WHERE state = 'paused'
+GROUP BY state, result
+"""
+
+FACTS_STATISTICS_QUERY = """
+SELECT c.reltuples, s.most_common_freqs
+FROM pg_class c
+JOIN pg_stats s ON s.schemaname = 'public' AND s.tablename = c.relname AND s.attname = 'host_id'
+WHERE c.oid = 'public.fact_values'::regclass
+"""
+
+PULP_TASKS_QUERY = """
+SELECT state, count(*)
+FROM core_task
+WHERE state IN ('waiting', 'running')
+GROUP BY state
+"""
+
+PULP_WORKERS_QUERY = """
+SELECT count(*) FROM core_worker WHERE last_heartbeat > now() - interval '1 minute'
+"""
+
+
+class Metrics:
+    """Metric families in the order they were first added."""
+
+    def __init__(self):
+        self.families = {}
+
+    def add(self, name, kind, help_text, value, **labels):
+        family = self.families.setdefault(name, {'type': kind, 'help': help_text, 'samples': []})
+        family['samples'].append((labels, value))
+
+    def render(self):
+        lines = []
+        for name, family in self.families.items():
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for labels, value in family['samples']:
+                label_text = ','.join(f'{key}="{escape(str(label))}"' for key, label in sorted(labels.items()))
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def run_command(argv):
+    return subprocess.run(argv, capture_output=True, text=True, check=True).stdout
+
+
+def collect_services(metrics, run=run_command):
+    """Record whether every service of foreman.target is active, as check_services does."""
+    units = run(['systemctl', 'list-dependencies', '--plain', 'foreman.target']).split()
+    states = json.loads(run(['systemctl', 'list-units', '--output=json', '--all'] + units))
+    for state in states:
+        if not state['unit'].endswith('.service') or state['unit'].startswith('foreman-recurring@'):
+            continue
+        metrics.add('foremanctl_service_active', 'gauge', 'Whether a service of foreman.target is active.',
+                    int(state['active'] == 'active'), unit=state['unit'][:-len('.service')], sub=state['sub'])
+
+
+def collect_database(metrics, name, query):
+    size, connections = query(DATABASE_QUERY)[0]
+    metrics.add('foremanctl_database_size_bytes', 'gauge', 'Size of a database.', size, database=name)
+    metrics.add('foremanctl_database_connections', 'gauge', 'Open connections to a database.', connections,
+                database=name)
+
+
+def collect_foreman(metrics, query, tasks):
+    """Record paused Foreman tasks by result and the largest facts count of a host."""
+    if tasks:
+        counts = {result: count for _state, result, count in query(FOREMAN_TASKS_QUERY)}
+        for result in sorted(set(counts) | {'error'}):
+            metrics.add('foremanctl_foreman_tasks_paused', 'gauge', 'Paused Foreman tasks by result.',
+                        counts.get(result, 0), result=result)
+
+    statistics = query(FACTS_STATISTICS_QUERY)
+    if statistics and statistics[0][0] > 0 and statistics[0][1]:
+        reltuples, frequencies = statistics[0]
+        metrics.add('foremanctl_host_facts_max_estimate', 'gauge',
+                    'Facts count of the host with the most facts, estimated from the planner statistics.',
+                    round(max(frequencies) * reltuples))
+
+
+def collect_pulp(metrics, query):
+    """Record the depth of the Pulp task queue and the number of workers online."""
+    counts = dict(query(PULP_TASKS_QUERY))
+    for state in ('waiting', 'running'):
+        metrics.add('foremanctl_pulp_tasks', 'gauge', 'Pulp tasks waiting in the queue or running.',
+                    counts.get(state, 0), state=state)
+    metrics.add('foremanctl_pulp_workers_online', 'gauge', 'Pulp workers with a heartbeat in the last minute.',
+                query(PULP_WORKERS_QUERY)[0][0])
+
+
+def connect(database):
+    connection = psycopg2.connect(dbname=database['database'], host=database['host'], port=database['port'],
+                                  user=database['user'], password=database['password'],
+                                  sslmode=database.get('ssl_mode') or 'prefer', connect_timeout=10)
+    connection.autocommit = True
+    return connection
+
+
+def make_query(connection):
+    def query(sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+    return query
+
+
+def collect(config, metrics, clock=time.time):
+    """
+    Run every collector the configuration enables.
+
+    A failing collector does not stop the others; its failure is recorded
+    in foremanctl_metrics_collector_success instead.
+    """
+    collectors = [('services', collect_services)]
+    for database in config.get('databases', []):
+        def collect_from(metrics, database=database):
+            connection = connect(database)
+            try:
+                query = make_query(connection)
+                collect_database(metrics, database['name'], query)
+                if database['name'] == 'foreman':
+                    collect_foreman(metrics, query, config.get('foreman_tasks', False))
+                elif database['name'] == 'pulp':
+                    collect_pulp(metrics, query)
+            finally:
+                connection.close()
+        collectors.append((f"database/{database['name']}", collect_from))
+
+    for name, collector in collectors:
+        started = clock()
+        try:
+            collector(metrics)
+            success = 1
+        except Exception:  # a broken collector must not take down the others
+            success = 0
+        metrics.add('foremanctl_metrics_collector_success', 'gauge', 'Whether a collector succeeded.',
+                    success, collector=name)
+        metrics.add('foremanctl_metrics_collector_duration_seconds', 'gauge', 'Time a collector took.',
+                    round(clock() - started, 3), collector=name)
+    metrics.add('foremanctl_metrics_last_run_timestamp_seconds', 'gauge', 'When the metrics were collected.',
+                round(clock()))
+    return metrics
+
+
+def write_atomically(path, text):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as output:
+        output.write(text)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--config', default='/etc/foremanctl/metrics.json')
+    args = parser.parse_args()
+
+    with open(args.config) as config_file:
+        config = json.load(config_file)
+    write_atomically(config['output'], collect(config, Metrics()).render())
+
+
+if __name__ == '__main__':
+    main()
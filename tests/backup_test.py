@@ -110,21 +110,28 @@ def test_database_dumps_created(server, backup_result, expected_databases, backu
     backup_dir = backup_result['backup_dir']
     database_mapping = backup_metadata.get('database_mapping', {})
 
+    database_dumps = backup_metadata.get('database_dumps', {})
+
     for database_name in expected_databases:
         actual_db_name = database_mapping.get(database_name, database_name)
         dump_file = f"{actual_db_name}.dump"
         dump_path = f"{backup_dir}/{dump_file}"
         file_check = server.file(dump_path)
         assert file_check.exists, f"Database dump {dump_file} should exist at {dump_path}"
-        assert file_check.is_file, f"{dump_file} should be a file"
+        if database_dumps.get(database_name, {}).get('format') == 'directory':
+            assert file_check.is_directory, f"{dump_file} should be a pg_dump directory"
+            dump_path = f"{dump_path}/toc.dat"
+            file_check = server.file(dump_path)
+        else:
+            assert file_check.is_file, f"{dump_file} should be a file"
         assert file_check.size > 0, f"{dump_file} should not be empty"
         assert file_check.mode & 0o400, f"{dump_file} should be readable by owner"
 
-        # Verify pg_dump custom format
+        # Verify pg_dump archive header
         result = server.run(f"head -c 5 {dump_path}")
         assert result.rc == 0
         assert result.stdout.startswith('PGDMP'), \
-            f"{dump_file} should be a valid pg_dump custom format file (should start with PGDMP)"
+            f"{dump_file} should be a valid pg_dump archive (should start with PGDMP)"
 
 
 @pytest.mark.feature("iop")
@@ -253,6 +260,31 @@ def test_metadata_structure(backup_metadata, expected_databases):
         f"Expected databases {expected_db_set} should match actual {actual_databases}"
 
 
+def test_metadata_database_dump_timings(backup_metadata, expected_databases):
+    database_dumps = backup_metadata.get('database_dumps', {})
+
+    assert set(database_dumps) == set(expected_databases), \
+        f"Metadata should record a dump for every database, got {set(database_dumps)}"
+    for database_name, dump in database_dumps.items():
+        assert dump['format'] in ['custom', 'directory'], f"Unexpected dump format for {database_name}"
+        assert float(dump['seconds']) >= 0, f"Dump duration for {database_name} should be recorded"
+        assert int(dump['bytes']) > 0, f"Dump size for {database_name} should be recorded"
+
+
+def test_metadata_phase_timings(backup_metadata):
+    phases = {phase['name']: phase for phase in backup_metadata.get('phases', [])}
+
+    for name in ['preflight', 'stop_services', 'database_dumps', 'foremanctl_state', 'metadata']:
+        assert name in phases, f"Metadata should record timing for the {name} phase"
+        assert float(phases[name]['seconds']) >= 0
+    assert int(phases['database_dumps']['bytes']) > 0, "Database dump phase should record bytes written"
+
+
+def test_metadata_pulp_content_compression(backup_metadata):
+    assert backup_metadata['pulp_content_compression'] == 'gzip', "Pulp content should be gzip compressed by default"
+    assert backup_metadata['pulp_content_archive'] == 'pulp-content.tar.gz'
+
+
 def test_metadata_backed_up_components(backup_metadata):
     assert 'backed_up_components' in backup_metadata, "Metadata should list backed up components"
 
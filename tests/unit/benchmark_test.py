@@ -0,0 +1,52 @@
+from benchmark import startup_regressions
+
+BASELINE = {
+    'target': 60.0,
+    'usable': 75.0,
+    'endpoints': {'foreman': 75.0, 'pulp': 20.0},
+    'units': [
+        {'name': 'foreman.service', 'seconds': 50.0},
+        {'name': 'redis.service', 'seconds': 0.5},
+        {'name': 'pulp-api.service', 'seconds': None},
+    ],
+}
+
+
+def report(**changes):
+    return dict(BASELINE, **changes)
+
+
+def test_no_regressions():
+    assert startup_regressions(BASELINE, BASELINE) == []
+
+
+def test_no_baseline():
+    assert startup_regressions(BASELINE, {}) == []
+
+
+def test_regression_over_threshold():
+    regressions = startup_regressions(report(target=80.0), BASELINE)
+
+    assert regressions == [{'metric': 'target', 'baseline': 60.0, 'current': 80.0, 'increase': 33.3}]
+
+
+def test_within_threshold():
+    assert startup_regressions(report(target=70.0), BASELINE) == []
+    assert startup_regressions(report(target=70.0), BASELINE, threshold=10) != []
+
+
+def test_small_increases_ignored():
+    units = [{'name': 'redis.service', 'seconds': 1.5}]
+
+    assert startup_regressions(report(units=units), BASELINE) == []
+    assert startup_regressions(report(units=units), BASELINE, min_seconds=0)[0]['metric'] == 'unit redis.service'
+
+
+def test_sorted_by_increase():
+    regressions = startup_regressions(report(endpoints={'foreman': 100.0, 'pulp': 40.0}), BASELINE)
+
+    assert [regression['metric'] for regression in regressions] == ['endpoint foreman', 'endpoint pulp']
+
+
+def test_threshold_as_string():
+    assert startup_regressions(report(target=70.0), BASELINE, threshold='10') != []
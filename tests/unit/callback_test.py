@@ -0,0 +1,124 @@
+import importlib.util
+import json
+import os
+
+# loaded under its own name, the filter plugin is already importable as foremanctl
+_spec = importlib.util.spec_from_file_location(
+    'foremanctl_callback', os.path.join(os.path.dirname(__file__), '../../src/callback_plugins/foremanctl.py'))
+foremanctl_callback = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(foremanctl_callback)
+
+
+class TestFormatSize:
+    """Test human readable sizes in the phase table"""
+
+    def test_bytes(self):
+        assert foremanctl_callback.format_size(512) == '512 B'
+
+    def test_binary_units(self):
+        assert foremanctl_callback.format_size(5 * 1024 * 1024) == '5.0 MiB'
+        assert foremanctl_callback.format_size(3 * 1024 ** 4) == '3.0 TiB'
+
+
+class TestFormatPhases:
+    """Test rendering phase timings"""
+
+    def test_rows_and_total(self):
+        output = foremanctl_callback.format_phases([
+            {'name': 'database_dumps', 'seconds': 10.5, 'bytes': 1048576, 'mb_per_second': 0.1},
+            {'name': 'metadata', 'seconds': '1.25', 'bytes': 0, 'mb_per_second': 0.0},
+        ]).splitlines()
+
+        assert output[0].split() == ['PHASE', 'SECONDS', 'SIZE', 'MB/s']
+        assert output[1].split() == ['database_dumps', '10.50', '1.0', 'MiB', '0.10']
+        assert output[2].split() == ['metadata', '1.25', '-', '-']
+        assert output[3].split() == ['total', '11.75']
+
+    def test_missing_bytes(self):
+        output = foremanctl_callback.format_phases([{'name': 'preflight', 'seconds': 2}]).splitlines()
+
+        assert output[1].split() == ['preflight', '2.00', '-', '-']
+
+
+def test_format_startup():
+    output = foremanctl_callback.format_startup([
+        {'name': 'postgresql.service', 'started': 0.0, 'seconds': 6.5, 'state': 'ready'},
+        {'name': 'foreman.service', 'started': None, 'seconds': None, 'state': 'skipped'},
+    ]).splitlines()
+
+    assert output[0].split() == ['SERVICE', 'WAITED', 'READY', 'IN', 'STATE']
+    assert output[1].split() == ['postgresql.service', '0.00', '6.50', 'ready']
+    assert output[2].split() == ['foreman.service', '-', '-', 'skipped']
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTaskProfile:
+    """Test per-task and per-role profiling"""
+
+    def run(self, tasks):
+        clock = FakeClock()
+        profile = foremanctl_callback.TaskProfile(clock=clock)
+        for name, role, seconds, handler in tasks:
+            profile.start(name, role, handler=handler)
+            clock.now += seconds
+        profile.stop()
+        return profile
+
+    def test_task_ends_when_next_starts(self):
+        profile = self.run([('first', None, 1.5, False), ('second', 'pulp', 2.0, False)])
+
+        assert [(task['name'], task['seconds']) for task in profile.tasks] == [('first', 1.5), ('second', 2.0)]
+
+    def test_roles_sorted_by_time(self):
+        profile = self.run([
+            ('a', 'foreman', 1.0, False),
+            ('b', 'pulp', 5.0, False),
+            ('c', 'foreman', 1.0, False),
+            ('d', None, 0.5, False),
+        ])
+
+        assert profile.roles() == [['pulp', 5.0, 1], ['foreman', 2.0, 2], ['-', 0.5, 1]]
+
+    def test_handlers_aggregated_by_name(self):
+        profile = self.run([('Restart pulp', 'pulp', 3.0, True), ('Restart pulp', 'pulp', 2.0, True)])
+        profile.tasks[0]['changed'] = 1
+        profile.tasks[1]['changed'] = 1
+
+        assert profile.handlers() == [['Restart pulp', 5.0, 2]]
+
+    def test_retries_counted_on_running_task(self):
+        clock = FakeClock()
+        profile = foremanctl_callback.TaskProfile(clock=clock)
+        profile.start('Wait for service', 'foreman')
+        profile.retried()
+        profile.retried()
+        profile.stop()
+        profile.retried()
+
+        assert profile.tasks[0]['retries'] == 2
+
+    def test_report_limits_slowest_tasks(self):
+        profile = self.run([(f'task {i}', 'role', float(i), False) for i in range(5)])
+
+        sections = dict(profile.report(top=2))
+        rows = sections['SLOWEST TASKS (top 2)'].splitlines()
+
+        assert len(rows) == 3
+        assert rows[1].split()[-2:] == ['task', '4']
+        assert 'HANDLERS' not in sections
+        assert 'RETRIED TASKS' not in sections
+
+    def test_trace_is_serializable(self):
+        profile = self.run([('a', 'foreman', 1.0, False)])
+
+        trace = json.loads(json.dumps(profile.trace()))
+
+        assert trace['roles'] == [{'role': 'foreman', 'seconds': 1.0, 'tasks': 1}]
+        assert trace['tasks'][0]['name'] == 'a'
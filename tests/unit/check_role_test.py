@@ -7,13 +7,14 @@ SRC_DIR = os.path.abspath(os.path.join(TEST_DIR, '..', '..', 'src'))
 ROLES_DIR = os.path.join(SRC_DIR, 'roles')
 
 
-def ensure_role_has_feature_guards(check_role, features, tasks=None):
+def ensure_role_has_feature_guards(check_role, features, tasks=None, tasks_file='main.yaml'):
     """Ensure selected top-level tasks in role run only when all required features are present"""
     role_path = os.path.join(ROLES_DIR, check_role)
-    main_yaml = os.path.join(role_path, 'tasks', 'main.yaml')
-    with open(main_yaml, 'r') as f:
+    tasks_yaml = os.path.join(role_path, 'tasks', tasks_file)
+    with open(tasks_yaml, 'r') as f:
         all_tasks = yaml.safe_load(f)
     filtered_tasks = [t for t in all_tasks if tasks is None or t.get('name') in tasks]
+    assert filtered_tasks, f"No tasks to check in {tasks_yaml}"
     for task in filtered_tasks:
         assert 'when' in task, f"Task '{task.get('name')}' missing when condition"
         when_condition = task['when']
@@ -24,8 +25,10 @@ def ensure_role_has_feature_guards(check_role, features, tasks=None):
 
 
 def test_check_foreman_api_has_feature_guards():
-    ensure_role_has_feature_guards('check_foreman_api', ['tasks', 'katello'], ["Check Foreman tasks status"])
+    ensure_role_has_feature_guards('check_foreman_api', ['tasks', 'katello'], ["Check Foreman tasks status"], 'join.yml')
 
 
 def test_check_foreman_tasks_has_feature_guards():
     ensure_role_has_feature_guards('check_foreman_tasks', ['tasks'])
+    ensure_role_has_feature_guards('check_foreman_tasks', ['tasks'], tasks_file='start.yml')
+    ensure_role_has_feature_guards('check_foreman_tasks', ['tasks'], tasks_file='join.yml')
@@ -0,0 +1,172 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/plugins/modules'))
+
+import database_index_check
+
+
+def index(name, pages=1, modified=0):
+    return {'oid': hash(name), 'name': name, 'table': f'{name}_table', 'pages': pages, 'unique': True,
+            'modified': modified}
+
+
+class FakeDatabase:
+    """Connections recording which indexes they checked and how many ran at once"""
+
+    def __init__(self, delay=0.02, failures=None):
+        self.delay = delay
+        self.failures = failures or {}
+        self.connections = 0
+        self.checked = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def connect(self):
+        database = self
+        with self.lock:
+            self.connections += 1
+
+        class Checker:
+            closed = False
+
+            def __call__(self, index, timeout):
+                with database.lock:
+                    database.in_flight += 1
+                    database.max_in_flight = max(database.max_in_flight, database.in_flight)
+                time.sleep(database.delay)
+                with database.lock:
+                    database.in_flight -= 1
+                    database.checked.append(index['name'])
+                if index['name'] in database.failures:
+                    raise database_index_check.CheckFailed(*database.failures[index['name']])
+
+            def close(self):
+                self.closed = True
+
+        return Checker()
+
+
+class TestSelectIndexes:
+    """Test the check order and the resumable cursor"""
+
+    def test_largest_first(self):
+        indexes = [index('small', pages=1), index('large', pages=100), index('medium', pages=10)]
+
+        selected = database_index_check.select_indexes(indexes, 'size', {'covered': [], 'passes': 0})
+
+        assert [i['name'] for i in selected] == ['large', 'medium', 'small']
+
+    def test_most_modified_first(self):
+        indexes = [index('cold', pages=100), index('hot', pages=1, modified=5000), index('warm', modified=10)]
+
+        selected = database_index_check.select_indexes(indexes, 'modified', {'covered': [], 'passes': 0})
+
+        assert [i['name'] for i in selected] == ['hot', 'warm', 'cold']
+
+    def test_covered_indexes_are_skipped(self):
+        indexes = [index('a'), index('b'), index('c')]
+        cursor = {'covered': ['a', 'dropped'], 'passes': 0}
+
+        selected = database_index_check.select_indexes(indexes, 'size', cursor)
+
+        assert [i['name'] for i in selected] == ['b', 'c']
+        assert cursor['covered'] == ['a']
+
+    def test_new_pass_when_everything_is_covered(self):
+        indexes = [index('a'), index('b')]
+        cursor = {'covered': ['a', 'b'], 'passes': 2}
+
+        selected = database_index_check.select_indexes(indexes, 'size', cursor)
+
+        assert len(selected) == 2
+        assert cursor == {'covered': [], 'passes': 3}
+
+    def test_cursor_copied(self):
+        cursor = {'covered': ['a'], 'passes': 1}
+        loaded = database_index_check.load_cursor(cursor)
+        loaded['covered'].append('b')
+
+        assert loaded == {'covered': ['a', 'b'], 'passes': 1}
+        assert cursor == {'covered': ['a'], 'passes': 1}
+
+    def test_missing_or_broken_cursor(self):
+        assert database_index_check.load_cursor(None) == {'covered': [], 'passes': 0}
+        assert database_index_check.load_cursor({}) == {'covered': [], 'passes': 0}
+        assert database_index_check.load_cursor({'covered': ['a'], 'passes': 'x'}) == {'covered': [], 'passes': 0}
+
+
+class TestVerifyIndexes:
+    """Test checking indexes over several connections within a budget"""
+
+    def test_every_index_checked_once(self):
+        database = FakeDatabase()
+        indexes = [index(f'index{i}') for i in range(6)]
+
+        entries, unchecked = database_index_check.verify_indexes(indexes, database.connect, 3)
+
+        assert sorted(database.checked) == sorted(i['name'] for i in indexes)
+        assert unchecked == []
+        assert database.connections == 3
+        assert database.max_in_flight == 3
+        assert all(entry['seconds'] >= 0 for entry in entries)
+
+    def test_no_more_connections_than_indexes(self):
+        database = FakeDatabase()
+
+        database_index_check.verify_indexes([index('only')], database.connect, 4)
+
+        assert database.connections == 1
+
+    def test_failures_are_recorded_per_index(self):
+        database = FakeDatabase(failures={'bad': ('corrupted', 'item order invariant violated')})
+
+        entries, _ = database_index_check.verify_indexes([index('good'), index('bad')], database.connect, 1)
+
+        statuses = {entry['name']: (entry['status'], entry.get('msg')) for entry in entries}
+        assert statuses == {'good': ('passed', None), 'bad': ('corrupted', 'item order invariant violated')}
+
+    def test_budget_stops_starting_checks(self):
+        now = [0.0]
+
+        def clock():
+            return now[0]
+
+        class Checker:
+            def __call__(self, index, timeout):
+                assert timeout == 10 - now[0]
+                now[0] += 4
+
+            def close(self):
+                pass
+
+        indexes = [index(f'index{i}') for i in range(5)]
+
+        entries, unchecked = database_index_check.verify_indexes(indexes, Checker, 1, budget=10, clock=clock)
+
+        assert [entry['name'] for entry in entries] == ['index0', 'index1', 'index2']
+        assert [entry['seconds'] for entry in entries] == [4, 4, 4]
+        assert [i['name'] for i in unchecked] == ['index3', 'index4']
+
+    def test_connections_are_closed(self):
+        checkers = []
+
+        class Checker:
+            closed = False
+
+            def __init__(self):
+                checkers.append(self)
+
+            def __call__(self, index, timeout):
+                raise database_index_check.CheckFailed('error', 'lost connection')
+
+            def close(self):
+                self.closed = True
+
+        database_index_check.verify_indexes([index('a'), index('b')], Checker, 2)
+
+        assert len(checkers) == 2
+        assert all(checker.closed for checker in checkers)
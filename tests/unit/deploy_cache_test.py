@@ -0,0 +1,264 @@
+import os
+import textwrap
+
+import pytest
+from deploy_cache import deploy_fingerprints
+from deploy_cache import role_inputs
+from deploy_cache import unchanged_roles
+
+PLAYBOOK = os.path.join(os.path.dirname(__file__), '../../src/playbooks/deploy/deploy.yaml')
+
+ROLE_FILES = {
+    'foreman': {
+        'tasks/main.yml': '''
+            - name: Deploy Foreman
+              containers.podman.podman_container:
+                image: "{{ foreman_container_image }}"
+              register: foreman_container
+            - name: Configure workers
+              ansible.builtin.template:
+                src: foreman.env.j2
+                dest: /etc/foreman/foreman.env
+              when: foreman_container is changed
+        ''',
+        'templates/foreman.env.j2': 'PUMA_WORKERS={{ foreman_puma_workers }}\n',
+    },
+    'pulp': {
+        'tasks/main.yml': '''
+            - name: Start the images
+              ansible.builtin.include_role:
+                name: images
+                tasks_from: pull
+            - name: Deploy Pulp
+              containers.podman.podman_container:
+                image: "{{ pulp_container_image }}"
+                env:
+                  WORKERS: "{{ pulp_worker_count }}"
+                  CPUS: "{{ ansible_facts.processor_vcpus }}"
+        ''',
+    },
+    'images': {
+        'tasks/main.yml': '''
+            - name: Pull all images
+              ansible.builtin.include_tasks: "{{ item }}.yml"
+              loop: "{{ images_sources }}"
+        ''',
+        'tasks/pull.yml': '''
+            - name: Pull the images
+              ansible.builtin.command: podman pull {{ item }}
+              loop: "{{ images_pull }}"
+              register: images_jobs
+            - name: Wait for the pulls
+              ansible.builtin.include_tasks: wait.yml
+        ''',
+        'tasks/wait.yml': '''
+            - name: Wait for the pulls
+              ansible.builtin.async_status:
+                jid: "{{ item.ansible_job_id }}"
+              loop: "{{ images_jobs.results }}"
+        ''',
+    },
+    'checks': {
+        'tasks/main.yml': '''
+            - name: Run the checks
+              ansible.builtin.include_role:
+                name: "{{ item }}"
+              loop: "{{ checks_roles }}"
+        ''',
+    },
+    'certificates': {
+        'tasks/main.yml': '''
+            - name: Read the CA
+              ansible.builtin.slurp:
+                src: /ca.crt
+              register: certificates_ca
+        ''',
+    },
+    'candlepin': {
+        'tasks/main.yml': '''
+            - name: Deploy Candlepin
+              ansible.builtin.copy:
+                content: "{{ certificates_ca.content }}"
+                dest: /etc/candlepin/ca.crt
+        ''',
+    },
+}
+
+CACHED = '''
+    - hosts: quadlet
+      roles:
+        - role: foreman
+          when: "'foreman' not in deploy_cache_skipped"
+        - role: pulp
+          when:
+            - "'pulp' not in deploy_cache_skipped"
+            - "'katello' in enabled_features"
+          vars:
+            pulp_worker_count: "{{ tuning_workers }}"
+        - role: checks
+          when: "'checks' not in deploy_cache_skipped"
+        - role: certificates
+        - role: candlepin
+          when: "'candlepin' not in deploy_cache_skipped"
+'''
+
+VARIABLES = {
+    'enabled_features': ['foreman', 'katello'],
+    'tuning_workers': 2,
+    'foreman_container_image': 'quay.io/foreman/foreman',
+    'foreman_puma_workers': 4,
+    'pulp_container_image': 'quay.io/foreman/pulp',
+    'images_pull': ['quay.io/foreman/foreman', 'quay.io/foreman/pulp'],
+    'ansible_facts': {'processor_vcpus': 4, 'memtotal_mb': 8192},
+}
+
+
+class Variables(dict):
+    """Raise on access to the names in undefined, like a variable templating an undefined value"""
+
+    def __init__(self, values, undefined=()):
+        super().__init__(values)
+        self.undefined = undefined
+
+    def __getitem__(self, name):
+        if name in self.undefined:
+            raise KeyError(name)
+        return super().__getitem__(name)
+
+
+@pytest.fixture
+def roles_path(tmp_path):
+    for role, files in ROLE_FILES.items():
+        for name, content in files.items():
+            path = tmp_path / 'roles' / role / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(textwrap.dedent(content))
+    return tmp_path / 'roles'
+
+
+@pytest.fixture
+def playbook(tmp_path):
+    path = tmp_path / 'deploy.yaml'
+    path.write_text(textwrap.dedent(CACHED))
+    return path
+
+
+def fingerprints(variables, playbook, roles_path, images=()):
+    return deploy_fingerprints(variables, playbook, ['enabled_features'], images, roles_path)
+
+
+def test_cached_roles(playbook, roles_path):
+    assert set(fingerprints(VARIABLES, playbook, roles_path)) == {'foreman', 'pulp', 'checks', 'candlepin'}
+
+
+def test_fingerprints_are_stable(playbook, roles_path):
+    assert fingerprints(VARIABLES, playbook, roles_path) == fingerprints(dict(VARIABLES), playbook, roles_path)
+
+
+@pytest.mark.parametrize('variable, value, role', [
+    ('foreman_container_image', 'quay.io/foreman/foreman:3.14', 'foreman'),
+    ('foreman_puma_workers', 8, 'foreman'),
+    ('tuning_workers', 4, 'pulp'),
+    ('images_pull', ['quay.io/foreman/pulp'], 'pulp'),
+])
+def test_variable_only_changes_its_role(playbook, roles_path, variable, value, role):
+    before = fingerprints(VARIABLES, playbook, roles_path)
+    after = fingerprints(dict(VARIABLES, **{variable: value}), playbook, roles_path)
+
+    assert before[role] != after[role]
+    assert all(before[other] == after[other] for other in ('foreman', 'pulp') if other != role)
+
+
+def test_unreferenced_variable(playbook, roles_path):
+    before = fingerprints(VARIABLES, playbook, roles_path)
+    after = fingerprints(dict(VARIABLES, pulp_worker_count=8, foreman_unused=True), playbook, roles_path)
+
+    assert before == after
+
+
+def test_entry_condition(playbook, roles_path):
+    before = fingerprints(VARIABLES, playbook, roles_path)
+    after = fingerprints(dict(VARIABLES, enabled_features=['foreman']), playbook, roles_path)
+
+    assert before['pulp'] != after['pulp']
+
+
+def test_referenced_facts(playbook, roles_path):
+    before = fingerprints(VARIABLES, playbook, roles_path)
+    facts = dict(VARIABLES['ansible_facts'], memtotal_mb=4096)
+    unused = fingerprints(dict(VARIABLES, ansible_facts=facts), playbook, roles_path)
+    facts = dict(VARIABLES['ansible_facts'], processor_vcpus=8)
+    used = fingerprints(dict(VARIABLES, ansible_facts=facts), playbook, roles_path)
+
+    assert before == unused
+    assert before['pulp'] != used['pulp']
+    assert before['foreman'] == used['foreman']
+
+
+def test_included_role_files(playbook, roles_path):
+    before = fingerprints(VARIABLES, playbook, roles_path)
+    (roles_path / 'images' / 'tasks' / 'wait.yml').write_text('# changed\n')
+    after = fingerprints(VARIABLES, playbook, roles_path)
+
+    assert before['pulp'] != after['pulp']
+    assert before['foreman'] == after['foreman']
+
+
+def test_included_tasks_only(roles_path):
+    inputs = role_inputs('pulp', roles_path=roles_path)
+
+    assert inputs.roles == {'pulp', 'images'}
+    assert 'images_pull' in inputs.references
+    assert 'images_sources' not in inputs.references
+    assert not inputs.incomplete
+
+
+def test_image_of_role_variable(playbook, roles_path):
+    images = [{'Id': 'a1', 'Names': ['quay.io/foreman/foreman:nightly']},
+              {'Id': 'b1', 'Names': ['quay.io/foreman/pulp:foreman-nightly']}]
+    pulled = [{'Id': 'a2', 'Names': ['quay.io/foreman/foreman:nightly']}, images[1]]
+
+    before = fingerprints(VARIABLES, playbook, roles_path, images)
+    after = fingerprints(VARIABLES, playbook, roles_path, pulled)
+
+    assert before['foreman'] != after['foreman']
+    assert before['pulp'] == after['pulp']
+
+
+def test_undefined_variable(playbook, roles_path):
+    variables = Variables(VARIABLES, undefined=['foreman_puma_workers'])
+
+    undefined = fingerprints(variables, playbook, roles_path)
+
+    assert undefined['foreman'] is not None
+    assert undefined == fingerprints(variables, playbook, roles_path)
+    assert undefined['foreman'] != fingerprints(dict(variables), playbook, roles_path)['foreman']
+
+
+def test_computed_role_include(playbook, roles_path):
+    assert fingerprints(VARIABLES, playbook, roles_path)['checks'] is None
+
+
+def test_state_of_another_role(playbook, roles_path):
+    assert fingerprints(VARIABLES, playbook, roles_path)['candlepin'] is None
+
+
+@pytest.mark.parametrize('variable, value', [
+    ('httpd_external_authentication', 'ipa'),
+    ('candlepin_oauth_secret', 'regenerated'),
+])
+def test_foreman_inputs_of_other_roles(variable, value):
+    variables = dict(VARIABLES, httpd_external_authentication=None, candlepin_oauth_secret='secret')
+
+    before = deploy_fingerprints(variables, PLAYBOOK)
+    after = deploy_fingerprints(dict(variables, **{variable: value}), PLAYBOOK)
+
+    assert before['foreman'] != after['foreman']
+    assert before['postgresql'] == after['postgresql']
+
+
+def test_unchanged_roles():
+    current = {'foreman': 'a', 'pulp': 'b', 'iop_core': 'c', 'checks': None}
+
+    assert unchanged_roles(current, {'foreman': 'a', 'pulp': 'x', 'checks': None}) == ['foreman']
+    assert unchanged_roles(current, None) == []
@@ -1,5 +1,13 @@
+import foremanctl
+import pytest
 from foremanctl import FEATURE_MAP
+from foremanctl import FeatureIndex
 from foremanctl import conflicting_features
+from foremanctl import feature_dependency_cycles
+from foremanctl import foreman_plugins
+from foremanctl import has_feature
+from foremanctl import reload_feature_map
+from foremanctl import resolve_features
 
 
 def _asymmetric_conflicts():
@@ -54,3 +62,106 @@ def test_conflict_with_unknown_feature_detected(monkeypatch):
     monkeypatch.setitem(FEATURE_MAP, 'test-a', {'conflicts': ['nonexistent']})
     errors = _asymmetric_conflicts()
     assert any('unknown feature nonexistent' in e for e in errors)
+
+
+def test_index_resolves_transitive_dependencies():
+    index = FeatureIndex({'a': {'dependencies': ['b']}, 'b': {'dependencies': ['c']}, 'c': {}})
+    assert index.get_dependencies('a') == {'b', 'c'}
+    assert index.get_dependencies('c') == set()
+    assert index.dependents['c'] == {'a', 'b'}
+
+
+def test_index_prefix_providers():
+    index = FeatureIndex({'content/rpm': {'dependencies': ['pulp']}, 'pulp': {}})
+    assert index.providers('content') == {'content', 'content/rpm'}
+    assert index.providers('pulp') == {'pulp', 'content/rpm'}
+    assert index.providers('unknown') == {'unknown'}
+
+
+def test_index_detects_cycles():
+    index = FeatureIndex({'a': {'dependencies': ['b']}, 'b': {'dependencies': ['a']}, 'c': {}})
+    assert index.cycles == [['a', 'b', 'a']]
+    assert index.get_dependencies('a') == {'a', 'b'}
+
+
+def test_no_dependency_cycles_in_features_yaml():
+    assert feature_dependency_cycles([]) == []
+
+
+def test_has_feature():
+    assert has_feature(['katello'], 'katello')
+    assert has_feature(['katello'], 'dynflow')
+    assert has_feature(['content/rpm'], 'content')
+    assert has_feature(['content/rpm'], 'pulp')
+    assert not has_feature(['foreman'], 'katello')
+    assert has_feature(['custom/thing'], 'custom')
+
+
+def test_foreman_plugins_include_dependencies_once():
+    assert foreman_plugins(['foreman', 'katello', 'tasks']) == ['katello', 'foreman-tasks']
+
+
+def test_resolution_is_cached_per_feature_list():
+    resolution = resolve_features(['foreman', 'katello'])
+    assert resolve_features(('foreman', 'katello')) is resolution
+    assert resolution.has_feature('pulp')
+    assert {'tasks', 'dynflow', 'pulp', 'candlepin'} <= resolution.resolved
+    assert resolution.foreman_proxy_plugins == ['dynflow']
+
+
+def test_resolution_databases():
+    databases = [{'name': 'foreman', 'feature': 'foreman'}, {'name': 'pulp', 'feature': 'pulp'}]
+    assert [db['name'] for db in resolve_features(['foreman']).databases(databases)] == ['foreman']
+
+
+def test_reload_clears_resolutions():
+    resolution = resolve_features(['foreman', 'katello'])
+    reload_feature_map()
+    assert resolve_features(['foreman', 'katello']) is not resolution
+    assert 'katello' in FEATURE_MAP
+
+
+def test_changing_feature_map_clears_lookups(monkeypatch):
+    monkeypatch.setitem(FEATURE_MAP, 'test-a', {'dependencies': []})
+    assert not has_feature(['test-a'], 'test-b')
+
+    monkeypatch.setitem(FEATURE_MAP, 'test-a', {'dependencies': ['test-b']})
+    monkeypatch.setitem(FEATURE_MAP, 'test-b', {})
+    assert has_feature(['test-a'], 'test-b')
+
+
+def test_deleting_feature_clears_lookups():
+    FEATURE_MAP['test-a'] = {'dependencies': ['test-b']}
+    try:
+        assert has_feature(['test-a'], 'test-b')
+    finally:
+        del FEATURE_MAP['test-a']
+
+    assert not has_feature(['test-a'], 'test-b')
+
+
+def test_feature_catalog_cache(tmp_path, monkeypatch):
+    features = tmp_path / 'features.yaml'
+    features.write_text('foo:\n  description: Foo\n')
+    cache = tmp_path / 'features-cache.json'
+    monkeypatch.setattr(foremanctl, '_feature_files', lambda: [features])
+
+    assert foremanctl.load_feature_catalog(cache) == {'foo': {'description': 'Foo'}}
+    assert cache.exists()
+
+    def fail(_files):
+        pytest.fail('feature metadata parsed despite a valid cache')
+
+    with monkeypatch.context() as m:
+        m.setattr(foremanctl, '_read_feature_map', fail)
+        assert foremanctl.load_feature_catalog(cache) == {'foo': {'description': 'Foo'}}
+
+    features.write_text('foo:\n  description: Changed\n')
+    assert foremanctl.load_feature_catalog(cache) == {'foo': {'description': 'Changed'}}
+
+
+def test_feature_catalog_without_cache(tmp_path, monkeypatch):
+    features = tmp_path / 'features.yaml'
+    features.write_text('foo: {}\n')
+    monkeypatch.setattr(foremanctl, '_feature_files', lambda: [features])
+    assert foremanctl.load_feature_catalog(tmp_path / 'missing' / 'features-cache.json') == {'foo': {}}
@@ -0,0 +1,81 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/plugins/modules'))
+
+import host_facts_count
+
+
+class FakeDatabase:
+    """Answer the module queries from a host_id to facts count mapping, recording the queries"""
+
+    def __init__(self, counts, statistics=None):
+        self.counts = counts
+        self.statistics = statistics
+        self.queries = []
+
+    def offenders(self, hosts, threshold, limit):
+        over = sorted(((host, count) for host, count in self.counts.items()
+                       if host in hosts and count >= threshold), key=lambda item: -item[1])
+        return [(host, f'host{host}.example.com', count, len(over)) for host, count in over[:limit]]
+
+    def query(self, sql, params):
+        self.queries.append(sql)
+        if sql == host_facts_count.STATISTICS_QUERY:
+            return [self.statistics] if self.statistics else []
+        if sql == host_facts_count.CANDIDATES_QUERY:
+            return self.offenders(params['hosts'], params['threshold'], params['limit'])
+        return self.offenders(self.counts, params['threshold'], params['limit'])
+
+
+class TestExactOffenders:
+    """Test counting the facts of every host on the server"""
+
+    def test_threshold_and_limit_passed_to_server(self):
+        calls = []
+
+        def query(sql, params):
+            calls.append(params)
+            return [(1, 'big.example.com', 20000, 3)]
+
+        total, hosts = host_facts_count.exact_offenders(query, 10000, 1)
+
+        assert calls == [{'threshold': 10000, 'limit': 1}]
+        assert total == 3
+        assert hosts == [{'host_id': 1, 'name': 'big.example.com', 'count': 20000}]
+
+    def test_no_offenders(self):
+        assert host_facts_count.exact_offenders(lambda sql, params: [], 10000, 20) == (0, [])
+
+    def test_query_applies_threshold_and_limit(self):
+        assert 'HAVING count(*) >= %(threshold)s' in host_facts_count.OFFENDERS_QUERY
+        assert 'LIMIT %(limit)s' in host_facts_count.OFFENDERS_QUERY
+
+
+class TestEstimatedOffenders:
+    """Test finding offenders through the planner statistics"""
+
+    def test_only_common_hosts_are_counted(self):
+        database = FakeDatabase({1: 30000, 2: 6000, 3: 100, 4: 50},
+                                statistics=(36150.0, [1, 2, 3], [0.83, 0.166, 0.003]))
+
+        total, hosts = host_facts_count.estimated_offenders(database.query, 10000, 20)
+
+        assert total == 1
+        assert hosts == [{'host_id': 1, 'name': 'host1.example.com', 'count': 30000}]
+        assert host_facts_count.OFFENDERS_QUERY not in database.queries
+
+    def test_candidates_below_threshold_are_not_reported(self):
+        database = FakeDatabase({1: 9000}, statistics=(9000.0, [1], [1.0]))
+
+        assert host_facts_count.estimated_offenders(database.query, 10000, 20) == (0, [])
+
+    def test_no_candidates_skips_counting(self):
+        database = FakeDatabase({1: 10, 2: 10}, statistics=(20.0, [1, 2], [0.5, 0.5]))
+
+        assert host_facts_count.estimated_offenders(database.query, 10000, 20) == (0, [])
+        assert database.queries == [host_facts_count.STATISTICS_QUERY]
+
+    def test_without_statistics(self):
+        assert host_facts_count.estimated_offenders(FakeDatabase({}).query, 10000, 20) is None
+        assert host_facts_count.estimated_offenders(FakeDatabase({}, (-1.0, None, None)).query, 10000, 20) is None
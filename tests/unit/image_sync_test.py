@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/plugins/modules'))
+
+import image_sync
+
+
+class FakeRegistry:
+    """A registry and local storage stand-in recording how pulls overlap"""
+
+    def __init__(self, remote, local=None, delay=0.02):
+        self.remote = remote
+        self.local = dict(local or {})
+        self.delay = delay
+        self.pulled = []
+        self.in_flight = set()
+        self.max_in_flight = 0
+        self.overlaps = []
+        self.lock = threading.Lock()
+
+    def inspect_remote(self, image):
+        if image not in self.remote:
+            raise image_sync.CommandError(f'manifest unknown: {image}')
+        digest, layers = self.remote[image]
+        return digest, dict(layers)
+
+    def inspect_local(self, image):
+        return {self.local[image]} if image in self.local else set()
+
+    def pull(self, image):
+        layers = set(self.remote[image][1])
+        with self.lock:
+            for other in self.in_flight:
+                if layers & set(self.remote[other][1]):
+                    self.overlaps.append((image, other))
+            self.in_flight.add(image)
+            self.max_in_flight = max(self.max_in_flight, len(self.in_flight))
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight.discard(image)
+            self.pulled.append(image)
+            self.local[image] = self.remote[image][0]
+
+    def sync(self, images, concurrency=4):
+        entries = image_sync.check_images(images, self.inspect_local, self.inspect_remote, concurrency)
+        return image_sync.pull_changed(entries, self.pull, concurrency)
+
+
+def definitions(*names):
+    return [{'name': name, 'image': f'registry.example.com/{name}:latest'} for name in names]
+
+
+def remote(*names, base=None):
+    images = {}
+    for name in names:
+        layers = {f'sha256:{name}-layer': 100}
+        if base:
+            layers[base] = 1000
+        images[f'registry.example.com/{name}:latest'] = (f'sha256:{name}-v2', layers)
+    return images
+
+
+class TestQuadletImages:
+    """Test resolving the images pulled by quadlet image services"""
+
+    def test_last_argument_of_exec_start(self):
+        output = ('---foreman-image.service---\n'
+                  '[Service]\n'
+                  'Environment=REGISTRY_AUTH_FILE=/etc/foreman/registry-auth.json\n'
+                  'ExecStart=/usr/bin/podman image pull quay.io/foreman/foreman:nightly\n'
+                  '\n'
+                  '---foreman.service---\n'
+                  'ExecStart=/usr/bin/podman run --name foreman quay.io/foreman/foreman:nightly\n')
+
+        assert image_sync.quadlet_images(lambda argv: output) == {
+            'foreman-image.service': 'quay.io/foreman/foreman:nightly',
+        }
+
+    def test_continued_exec_start(self):
+        output = ('---foreman-image.service---\n'
+                  'ExecStart=/usr/bin/podman image pull \\\n'
+                  '\tregistry.example.com/foreman:nightly\n')
+
+        assert image_sync.quadlet_images(lambda argv: output) == {
+            'foreman-image.service': 'registry.example.com/foreman:nightly',
+        }
+
+    def test_generator_failure(self):
+        def run(argv):
+            raise image_sync.CommandError('converting "foreman.image": unsupported key')
+
+        assert image_sync.quadlet_images(run) == {}
+
+    def test_missing_generator(self):
+        def run(argv):
+            raise FileNotFoundError(argv[0])
+
+        assert image_sync.quadlet_images(run) == {}
+
+
+class TestInspect:
+    """Test parsing podman and skopeo inspect output"""
+
+    def test_local_digests_include_repo_digests(self):
+        output = json.dumps([{'Digest': 'sha256:aaa', 'RepoDigests': ['quay.io/foreman/foreman@sha256:bbb']}])
+
+        assert image_sync.local_digests(lambda argv: output, 'foreman') == {'sha256:aaa', 'sha256:bbb'}
+
+    def test_local_digests_missing_image(self):
+        def run(argv):
+            raise image_sync.CommandError('image not known')
+
+        assert image_sync.local_digests(run, 'foreman') == set()
+
+    def test_remote_manifest_layer_sizes(self):
+        output = json.dumps({'Digest': 'sha256:aaa', 'LayersData': [{'Digest': 'sha256:l1', 'Size': 42}]})
+        calls = []
+
+        def run(argv):
+            calls.append(argv)
+            return output
+
+        assert image_sync.remote_manifest(run, 'quay.io/foreman/foreman:nightly', '/auth.json') == \
+            ('sha256:aaa', {'sha256:l1': 42})
+        assert calls[0][-2:] == ['--authfile=/auth.json', 'docker://quay.io/foreman/foreman:nightly']
+
+    def test_remote_manifest_without_layer_data(self):
+        output = json.dumps({'Digest': 'sha256:aaa', 'Layers': ['sha256:l1']})
+
+        assert image_sync.remote_manifest(lambda argv: output, 'foreman') == ('sha256:aaa', {'sha256:l1': 0})
+
+
+class TestSync:
+    """Test digest-aware, bounded and layer-aware pulling"""
+
+    def test_unchanged_images_are_not_pulled(self):
+        registry = FakeRegistry(remote('foreman', 'pulp'),
+                                local={'registry.example.com/foreman:latest': 'sha256:foreman-v2'})
+
+        entries = registry.sync(definitions('foreman', 'pulp'))
+
+        assert registry.pulled == ['registry.example.com/pulp:latest']
+        assert [entry['changed'] for entry in entries] == [False, True]
+        assert entries[0]['bytes'] == 0
+
+    def test_only_missing_leaves_present_images_alone(self):
+        registry = FakeRegistry(remote('foreman', 'pulp'),
+                                local={'registry.example.com/foreman:latest': 'sha256:foreman-v1'})
+        inspected = []
+
+        def inspect_remote(image):
+            inspected.append(image)
+            return registry.inspect_remote(image)
+
+        entries = image_sync.check_images(definitions('foreman', 'pulp'), registry.inspect_local, inspect_remote, 2,
+                                          only_missing=True)
+        image_sync.pull_changed(entries, registry.pull, 2)
+
+        assert inspected == ['registry.example.com/pulp:latest']
+        assert registry.pulled == ['registry.example.com/pulp:latest']
+
+    def test_concurrency_is_bounded(self):
+        names = [f'image{i}' for i in range(6)]
+        registry = FakeRegistry(remote(*names))
+
+        registry.sync(definitions(*names), concurrency=2)
+
+        assert sorted(registry.pulled) == sorted(f'registry.example.com/{name}:latest' for name in names)
+        assert registry.max_in_flight == 2
+
+    def test_images_sharing_layers_are_not_pulled_together(self):
+        registry = FakeRegistry(remote('foreman', 'foreman-proxy', 'pulp', base='sha256:base'))
+
+        entries = registry.sync(definitions('foreman', 'foreman-proxy', 'pulp'), concurrency=3)
+
+        assert len(registry.pulled) == 3
+        assert registry.overlaps == []
+        assert registry.max_in_flight == 1
+        # the shared base layer is only counted for the first pull
+        assert sorted(entry['bytes'] for entry in entries) == [100, 100, 1100]
+
+    def test_inspect_failure_is_reported(self):
+        registry = FakeRegistry(remote('foreman'))
+
+        entries = registry.sync(definitions('foreman', 'missing'))
+
+        assert registry.pulled == ['registry.example.com/foreman:latest']
+        assert 'manifest unknown' in entries[1]['failed']
+
+    def test_pull_failure_is_reported(self):
+        registry = FakeRegistry(remote('foreman', 'pulp'))
+
+        def pull(image):
+            if 'pulp' in image:
+                raise image_sync.CommandError('connection reset')
+            registry.pull(image)
+
+        entries = image_sync.check_images(definitions('foreman', 'pulp'), registry.inspect_local,
+                                          registry.inspect_remote, 2)
+        image_sync.pull_changed(entries, pull, 2)
+
+        assert 'failed' not in entries[0]
+        assert entries[1]['failed'] == 'Could not pull registry.example.com/pulp:latest: connection reset'
+
+    @pytest.mark.parametrize('concurrency', [1, 4])
+    def test_seconds_recorded(self, concurrency):
+        registry = FakeRegistry(remote('foreman'))
+
+        entries = registry.sync(definitions('foreman'), concurrency=concurrency)
+
+        assert entries[0]['seconds'] > 0
+
+
+def write_blob(layout, content):
+    data = json.dumps(content).encode()
+    digest = hashlib.sha256(data).hexdigest()
+    path = layout / 'blobs' / 'sha256' / digest
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return {'digest': f'sha256:{digest}', 'size': len(data)}
+
+
+def add_to_layout(layout, name, layer_sizes):
+    """Add an image to an OCI layout, storing blobs by digest the way skopeo does"""
+    layers = [{'digest': f'sha256:layer-{layer}', 'size': size} for layer, size in layer_sizes.items()]
+    config = write_blob(layout, {'name': name})
+    manifest = write_blob(layout, {'config': config, 'layers': layers})
+    index_path = layout / 'index.json'
+    index = json.loads(index_path.read_text()) if index_path.exists() else {'manifests': []}
+    index['manifests'].append(dict(manifest, annotations={'org.opencontainers.image.ref.name': name}))
+    index_path.write_text(json.dumps(index))
+
+
+class TestBundle:
+    """Test exporting and importing image bundles"""
+
+    def test_shared_layers_counted_once(self, tmp_path):
+        add_to_layout(tmp_path, 'foreman', {'base': 1000, 'foreman': 10})
+        add_to_layout(tmp_path, 'foreman-proxy', {'base': 1000, 'proxy': 20})
+
+        references, blobs, size = image_sync.layout_blobs(tmp_path)
+
+        assert references == 6
+        assert blobs == 5
+        assert size > 1030
+
+    def test_export_writes_one_layout(self, tmp_path):
+        commands = []
+
+        def run(argv):
+            commands.append(argv)
+            layout, name = argv[-1][len('oci:'):].rsplit(':', 1)
+            add_to_layout(tmp_path / layout, name, {'base': 1000, name: 10})
+            return ''
+
+        images = definitions('foreman', 'pulp')
+        bundle = tmp_path / 'images'
+
+        summary = image_sync.export_bundle(run, images, str(bundle))
+
+        assert [argv[3] for argv in commands] == ['containers-storage:registry.example.com/foreman:latest',
+                                                  'containers-storage:registry.example.com/pulp:latest']
+        assert summary['blobs'] == summary['references'] - 1
+        assert json.loads((bundle / image_sync.BUNDLE_INDEX).read_text())['pulp'] == 'registry.example.com/pulp:latest'
+
+    def test_export_refuses_other_directories(self, tmp_path):
+        (tmp_path / 'data').write_text('keep')
+
+        with pytest.raises(ValueError):
+            image_sync.export_bundle(lambda argv: '', definitions('foreman'), str(tmp_path))
+
+        assert (tmp_path / 'data').exists()
+
+    def test_import_directory_in_place(self, tmp_path):
+        add_to_layout(tmp_path, 'foreman', {'base': 1000})
+        add_to_layout(tmp_path, 'pulp', {'base': 1000})
+        (tmp_path / image_sync.BUNDLE_INDEX).write_text(json.dumps({
+            'foreman': 'registry.example.com/foreman:latest',
+            'pulp': 'registry.example.com/pulp:latest',
+        }))
+        present = image_sync.layout_digests(tmp_path)['foreman']
+        commands = []
+
+        def inspect_local(image):
+            return {present} if 'foreman' in image else set()
+
+        def run(argv):
+            commands.append(argv)
+            return ''
+
+        entries = image_sync.import_bundle(run, str(tmp_path), inspect_local)
+
+        assert [(entry['name'], entry['changed']) for entry in entries] == [('foreman', False), ('pulp', True)]
+        assert commands == [['skopeo', 'copy', '--quiet', f'oci:{tmp_path}:pulp',
+                             'containers-storage:registry.example.com/pulp:latest']]
+        assert tmp_path.exists()
+
+    def test_import_refuses_archive(self, tmp_path):
+        bundle = tmp_path / 'images.tar'
+        bundle.write_bytes(b'')
+        commands = []
+
+        with pytest.raises(ValueError, match='Unpack'):
+            image_sync.import_bundle(commands.append, str(bundle), lambda image: set())
+
+        assert commands == []
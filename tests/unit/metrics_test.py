@@ -0,0 +1,118 @@
+import importlib.util
+import json
+import os
+
+spec = importlib.util.spec_from_file_location(
+    'foremanctl_metrics', os.path.join(os.path.dirname(__file__), '../../src/roles/metrics/files/foremanctl_metrics.py'))
+foremanctl_metrics = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(foremanctl_metrics)
+
+
+def samples(metrics, name):
+    return metrics.families[name]['samples']
+
+
+class TestRender:
+    """Test the Prometheus text format"""
+
+    def test_families_with_help_and_type(self):
+        metrics = foremanctl_metrics.Metrics()
+        metrics.add('foremanctl_pulp_tasks', 'gauge', 'Pulp tasks.', 3, state='waiting')
+        metrics.add('foremanctl_pulp_tasks', 'gauge', 'Pulp tasks.', 1, state='running')
+        metrics.add('foremanctl_metrics_last_run_timestamp_seconds', 'gauge', 'Last run.', 1700000000)
+
+        assert metrics.render() == (
+            '# HELP foremanctl_pulp_tasks Pulp tasks.\n'
+            '# TYPE foremanctl_pulp_tasks gauge\n'
+            'foremanctl_pulp_tasks{state="waiting"} 3\n'
+            'foremanctl_pulp_tasks{state="running"} 1\n'
+            '# HELP foremanctl_metrics_last_run_timestamp_seconds Last run.\n'
+            '# TYPE foremanctl_metrics_last_run_timestamp_seconds gauge\n'
+            'foremanctl_metrics_last_run_timestamp_seconds 1700000000\n'
+        )
+
+    def test_label_values_are_escaped(self):
+        metrics = foremanctl_metrics.Metrics()
+        metrics.add('m', 'gauge', 'help', 1, unit='a"b\\c')
+
+        assert 'm{unit="a\\"b\\\\c"} 1' in metrics.render()
+
+
+class TestCollectors:
+    """Test turning what the check roles look at into metrics"""
+
+    def test_services_of_foreman_target(self):
+        units = [
+            {'unit': 'foreman.service', 'active': 'active', 'sub': 'running'},
+            {'unit': 'pulp-api.service', 'active': 'failed', 'sub': 'failed'},
+            {'unit': 'foreman-recurring@daily.service', 'active': 'inactive', 'sub': 'dead'},
+            {'unit': 'foreman.socket', 'active': 'active', 'sub': 'listening'},
+        ]
+        commands = []
+
+        def run(argv):
+            commands.append(argv)
+            if argv[1] == 'list-dependencies':
+                return 'foreman.target\n  foreman.service\n  pulp-api.service\n'
+            return json.dumps(units)
+
+        metrics = foremanctl_metrics.Metrics()
+        foremanctl_metrics.collect_services(metrics, run)
+
+        assert commands[1][-3:] == ['foreman.target', 'foreman.service', 'pulp-api.service']
+        assert samples(metrics, 'foremanctl_service_active') == [
+            ({'unit': 'foreman', 'sub': 'running'}, 1),
+            ({'unit': 'pulp-api', 'sub': 'failed'}, 0),
+        ]
+
+    def test_foreman_tasks_and_facts(self):
+        answers = {
+            foremanctl_metrics.FOREMAN_TASKS_QUERY: [('paused', 'warning', 2)],
+            foremanctl_metrics.FACTS_STATISTICS_QUERY: [(100000.0, [0.25, 0.1])],
+        }
+
+        metrics = foremanctl_metrics.Metrics()
+        foremanctl_metrics.collect_foreman(metrics, answers.get, tasks=True)
+
+        assert samples(metrics, 'foremanctl_foreman_tasks_paused') == [({'result': 'error'}, 0),
+                                                                       ({'result': 'warning'}, 2)]
+        assert samples(metrics, 'foremanctl_host_facts_max_estimate') == [({}, 25000)]
+
+    def test_facts_without_statistics(self):
+        metrics = foremanctl_metrics.Metrics()
+        foremanctl_metrics.collect_foreman(metrics, lambda sql: [], tasks=False)
+
+        assert metrics.families == {}
+
+    def test_pulp_queue(self):
+        answers = {
+            foremanctl_metrics.PULP_TASKS_QUERY: [('waiting', 12)],
+            foremanctl_metrics.PULP_WORKERS_QUERY: [(4,)],
+        }
+
+        metrics = foremanctl_metrics.Metrics()
+        foremanctl_metrics.collect_pulp(metrics, answers.get)
+
+        assert samples(metrics, 'foremanctl_pulp_tasks') == [({'state': 'waiting'}, 12), ({'state': 'running'}, 0)]
+        assert samples(metrics, 'foremanctl_pulp_workers_online') == [({}, 4)]
+
+    def test_failing_collector_is_recorded(self, monkeypatch):
+        def broken(metrics, run=None):
+            raise OSError('systemctl not found')
+
+        monkeypatch.setattr(foremanctl_metrics, 'collect_services', broken)
+
+        metrics = foremanctl_metrics.collect({'databases': []}, foremanctl_metrics.Metrics())
+
+        assert samples(metrics, 'foremanctl_metrics_collector_success') == [({'collector': 'services'}, 0)]
+        assert 'foremanctl_metrics_last_run_timestamp_seconds' in metrics.families
+
+
+def test_write_atomically(tmp_path):
+    path = tmp_path / 'foremanctl.prom'
+    path.write_text('old\n')
+
+    foremanctl_metrics.write_atomically(str(path), 'new\n')
+
+    assert path.read_text() == 'new\n'
+    assert os.listdir(tmp_path) == ['foremanctl.prom']
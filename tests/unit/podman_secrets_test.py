@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/plugins/modules'))
+
+import podman_secrets
+
+
+def digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def listing(secrets):
+    return json.dumps([{'ID': name, 'Spec': {'Name': name, 'Labels': labels}} for name, labels in secrets.items()])
+
+
+class TestDesiredSecrets:
+    """Test resolving content and labels"""
+
+    def test_data_and_path(self):
+        desired = podman_secrets.desired_secrets(
+            [{'name': 'db-url', 'data': 'postgresql://x'},
+             {'name': 'key', 'path': '/var/lib/pulp/key', 'labels': {'app': 'pulp'}}],
+            read_file={'/var/lib/pulp/key': b'secret'}.get)
+
+        assert desired['db-url'] == {'content': b'postgresql://x',
+                                     'labels': {podman_secrets.DIGEST_LABEL: digest(b'postgresql://x')}}
+        assert desired['key']['labels'] == {'app': 'pulp', podman_secrets.DIGEST_LABEL: digest(b'secret')}
+
+    def test_scope_label(self):
+        desired = podman_secrets.desired_secrets([{'name': 'a', 'data': 'x'}], scope='foreman')
+
+        assert desired['a']['labels'][podman_secrets.SCOPE_LABEL] == 'foreman'
+
+
+class TestPlanSecrets:
+    """Test diffing desired and existing secrets"""
+
+    def test_only_changed_secrets(self):
+        desired = podman_secrets.desired_secrets([{'name': 'same', 'data': 'x'},
+                                                  {'name': 'changed', 'data': 'new'},
+                                                  {'name': 'new', 'data': 'y'}])
+        existing = podman_secrets.existing_secrets(listing({
+            'same': {podman_secrets.DIGEST_LABEL: digest(b'x')},
+            'changed': {podman_secrets.DIGEST_LABEL: digest(b'old')},
+        }))
+
+        plan = podman_secrets.plan_secrets(desired, existing)
+
+        assert plan == {'created': ['new'], 'updated': ['changed'], 'removed': []}
+
+    def test_secret_without_digest_is_updated(self):
+        desired = podman_secrets.desired_secrets([{'name': 'legacy', 'data': 'x'}])
+
+        plan = podman_secrets.plan_secrets(desired, podman_secrets.existing_secrets(listing({'legacy': {}})))
+
+        assert plan['updated'] == ['legacy']
+
+    def test_label_change_is_an_update(self):
+        desired = podman_secrets.desired_secrets([{'name': 'conf', 'data': 'x', 'labels': {'app': 'tomcat'}}])
+        existing = podman_secrets.existing_secrets(listing({
+            'conf': {'app': 'candlepin', podman_secrets.DIGEST_LABEL: digest(b'x')},
+        }))
+
+        assert podman_secrets.plan_secrets(desired, existing)['updated'] == ['conf']
+
+    def test_removes_only_own_scope(self):
+        desired = podman_secrets.desired_secrets([{'name': 'kept', 'data': 'x'}], scope='iop-gateway')
+        existing = podman_secrets.existing_secrets(listing({
+            'kept': dict(desired['kept']['labels']),
+            'obsolete': {podman_secrets.SCOPE_LABEL: 'iop-gateway'},
+            'other': {podman_secrets.SCOPE_LABEL: 'foreman'},
+            'unscoped': {},
+        }))
+
+        plan = podman_secrets.plan_secrets(desired, existing, scope='iop-gateway')
+
+        assert plan == {'created': [], 'updated': [], 'removed': ['obsolete']}
+
+    def test_empty_listing(self):
+        assert podman_secrets.existing_secrets('null') == {}
+
+
+def test_apply_plan():
+    commands = []
+    desired = podman_secrets.desired_secrets([{'name': 'new', 'data': 'a'}, {'name': 'changed', 'data': 'b'}])
+    plan = {'created': ['new'], 'updated': ['changed'], 'removed': ['old1', 'old2']}
+
+    podman_secrets.apply_plan(lambda argv, data=None: commands.append((argv, data)), plan, desired)
+
+    assert commands == [
+        (['podman', 'secret', 'create', f'--label={podman_secrets.DIGEST_LABEL}={digest(b"a")}', 'new', '-'], b'a'),
+        (['podman', 'secret', 'create', '--replace', f'--label={podman_secrets.DIGEST_LABEL}={digest(b"b")}',
+          'changed', '-'], b'b'),
+        (['podman', 'secret', 'rm', 'old1', 'old2'], None),
+    ]
@@ -0,0 +1,103 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/plugins/modules'))
+
+import pulp_content_manifest
+
+
+def make_file(root, rel_path, content=b'x'):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+class TestScanTree:
+    """Test walking the pulp storage directory"""
+
+    def test_scan_includes_files_with_size(self, tmp_path):
+        make_file(tmp_path, 'media/artifact/ab/cdef', b'12345')
+
+        entries = pulp_content_manifest.scan_tree(str(tmp_path), ['media'], [])
+
+        assert list(entries) == ['media/artifact/ab/cdef']
+        assert entries['media/artifact/ab/cdef'][0] == 5
+
+    def test_scan_skips_excluded_directories(self, tmp_path):
+        make_file(tmp_path, 'media/artifact/ab/cdef')
+        make_file(tmp_path, 'media/exports/export.tar')
+        make_file(tmp_path, 'django_secret_key')
+
+        entries = pulp_content_manifest.scan_tree(str(tmp_path), ['media'], ['media/exports'])
+
+        assert list(entries) == ['media/artifact/ab/cdef']
+
+    def test_scan_records_symlinks(self, tmp_path):
+        make_file(tmp_path, 'media/artifact/ab/cdef')
+        (tmp_path / 'media/linked-dir').symlink_to(tmp_path / 'media/artifact')
+        (tmp_path / 'media/linked-file').symlink_to(tmp_path / 'media/artifact/ab/cdef')
+
+        entries = pulp_content_manifest.scan_tree(str(tmp_path), ['media'], [])
+
+        assert sorted(entries) == ['media/artifact/ab/cdef', 'media/linked-dir', 'media/linked-file']
+
+
+class TestManifest:
+    """Test manifest persistence and comparison"""
+
+    def test_manifest_round_trip(self, tmp_path):
+        entries = {'media/a': (1, 10), 'media/b': (2, 20)}
+        manifest = tmp_path / 'manifest.json.gz'
+
+        pulp_content_manifest.write_manifest(str(manifest), entries)
+
+        assert pulp_content_manifest.read_manifest(str(manifest)) == entries
+
+    def test_diff_reports_new_changed_and_removed(self):
+        previous = {'media/kept': (1, 10), 'media/changed': (1, 10), 'media/removed': (1, 10)}
+        current = {'media/kept': (1, 10), 'media/changed': (2, 20), 'media/new': (3, 30)}
+
+        changed, removed = pulp_content_manifest.diff_manifests(current, previous)
+
+        assert changed == ['media/changed', 'media/new']
+        assert removed == ['media/removed']
+
+    def test_file_list_is_nul_separated(self, tmp_path):
+        file_list = tmp_path / 'files'
+
+        pulp_content_manifest.write_file_list(str(file_list), ['media/a', 'media/b c'])
+
+        assert file_list.read_bytes() == b'media/a\0media/b c\0'
+
+
+class TestPrune:
+    """Test removing content that is not part of a manifest"""
+
+    def test_prune_removes_unlisted_files(self, tmp_path):
+        make_file(tmp_path, 'media/kept')
+        make_file(tmp_path, 'media/orphan')
+
+        removed = pulp_content_manifest.prune_tree(str(tmp_path), ['media'], [], {'media/kept': (1, 0)})
+
+        assert removed == ['media/orphan']
+        assert (tmp_path / 'media/kept').exists()
+        assert not (tmp_path / 'media/orphan').exists()
+
+    def test_prune_check_mode_keeps_files(self, tmp_path):
+        make_file(tmp_path, 'media/orphan')
+
+        removed = pulp_content_manifest.prune_tree(str(tmp_path), ['media'], [], {}, check_mode=True)
+
+        assert removed == ['media/orphan']
+        assert (tmp_path / 'media/orphan').exists()
+
+    def test_prune_keeps_symlinks(self, tmp_path):
+        make_file(tmp_path, 'media/artifact/ab/cdef')
+        (tmp_path / 'media/linked-dir').symlink_to(tmp_path / 'media/artifact')
+        entries = {'media/artifact/ab/cdef': (1, 0)}
+
+        removed = pulp_content_manifest.prune_tree(str(tmp_path), ['media'], [], entries)
+
+        assert removed == []
+        assert (tmp_path / 'media/linked-dir').is_symlink()
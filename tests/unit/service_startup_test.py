@@ -0,0 +1,143 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/plugins/modules'))
+
+import service_startup
+
+SHOW = """After=network-online.target postgresql.service valkey.service
+ActiveState=inactive
+
+After=postgresql.service basic.target
+ActiveState=inactive
+
+After=basic.target
+ActiveState=active
+
+After=basic.target
+ActiveState=inactive
+"""
+
+UNITS = ['foreman.service', 'pulp-api.service', 'postgresql.service', 'valkey.service']
+
+
+def test_unit_name():
+    assert service_startup.unit_name('dynflow-sidekiq@worker') == 'dynflow-sidekiq@worker.service'
+    assert service_startup.unit_name('pulp-worker.target') == 'pulp-worker.target'
+    assert service_startup.unit_name('foreman.service') == 'foreman.service'
+
+
+def test_dependency_graph():
+    graph = service_startup.dependency_graph(UNITS, service_startup.parse_show(SHOW))
+
+    assert graph == {
+        'foreman.service': ['postgresql.service', 'valkey.service'],
+        'pulp-api.service': ['postgresql.service'],
+        'postgresql.service': [],
+        'valkey.service': [],
+    }
+
+
+def test_start_order_cycle():
+    with pytest.raises(service_startup.StartupError, match='a -> b -> a'):
+        service_startup.start_order({'a': ['b'], 'b': ['a']})
+
+
+GRAPH = {
+    'foreman.service': ['postgresql.service', 'valkey.service'],
+    'pulp-api.service': ['postgresql.service'],
+    'postgresql.service': [],
+    'valkey.service': [],
+}
+
+
+def test_dependencies_are_ready_first():
+    lock = threading.Lock()
+    ready = []
+
+    def bring_up(unit):
+        with lock:
+            assert set(GRAPH[unit]) <= set(ready)
+            ready.append(unit)
+
+    results = service_startup.run_startup(GRAPH, bring_up, concurrency=4)
+
+    assert sorted(ready) == sorted(GRAPH)
+    assert all(result['state'] == 'ready' for result in results.values())
+
+
+def test_independent_units_start_in_parallel():
+    both_started = threading.Barrier(2, timeout=5)
+
+    def bring_up(unit):
+        if unit in ('postgresql.service', 'valkey.service'):
+            both_started.wait()
+
+    results = service_startup.run_startup(GRAPH, bring_up, concurrency=4)
+
+    assert results['foreman.service']['state'] == 'ready'
+
+
+def test_failed_dependency_skips_dependents():
+    def bring_up(unit):
+        if unit == 'postgresql.service':
+            raise service_startup.StartupError('start job failed')
+
+    results = service_startup.run_startup(GRAPH, bring_up, concurrency=4)
+
+    assert results['postgresql.service']['state'] == 'failed'
+    assert results['pulp-api.service'] == {'state': 'skipped', 'msg': 'postgresql.service did not become ready',
+                                           'started': None, 'ready': None}
+    assert results['foreman.service']['state'] == 'skipped'
+    assert results['valkey.service']['state'] == 'ready'
+
+
+def test_critical_path():
+    results = {
+        'postgresql.service': {'ready': 4.0},
+        'valkey.service': {'ready': 1.0},
+        'pulp-api.service': {'ready': 6.0},
+        'foreman.service': {'ready': 12.0},
+    }
+
+    assert service_startup.critical_path(GRAPH, results) == ['postgresql.service', 'foreman.service']
+
+
+class TestWaitForSocket:
+    """Test waiting until a socket accepts connections"""
+
+    def setup_method(self):
+        self.now = 0
+        self.attempts = 0
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def test_backs_off_until_accepted(self):
+        def connect(address, timeout):
+            self.attempts += 1
+            if self.attempts < 4:
+                raise ConnectionRefusedError('refused')
+
+        service_startup.wait_for_socket('localhost:5432', 10, connect, self.clock, self.sleep)
+
+        assert self.attempts == 4
+        assert self.now == pytest.approx(0.05 + 0.1 + 0.2)
+
+    def test_deadline(self):
+        def connect(address, timeout):
+            raise ConnectionRefusedError('refused')
+
+        with pytest.raises(service_startup.StartupError, match='localhost:5432 did not accept connections'):
+            service_startup.wait_for_socket('localhost:5432', 3, connect, self.clock, self.sleep)
+
+
+def test_invalid_socket():
+    with pytest.raises(service_startup.StartupError, match='expected host:port'):
+        service_startup.normalize_services([{'name': 'postgresql', 'socket': 'localhost'}])
@@ -0,0 +1,120 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/plugins/modules'))
+
+import startup_benchmark
+
+SINCE = 1_000_000_000
+
+
+def unit(name, activating, active, after='', state='active'):
+    return {
+        'Id': name,
+        'After': after,
+        'ActiveState': state,
+        'InactiveExitTimestampMonotonic': str(SINCE + int(activating * 1e6)) if activating is not None else '0',
+        'ActiveEnterTimestampMonotonic': str(SINCE + int(active * 1e6)) if active is not None else '0',
+    }
+
+
+def test_parse_dependencies():
+    output = "foreman.target\n● postgresql.service\n○ foreman.service\npostgresql.service\n\n"
+
+    assert startup_benchmark.parse_dependencies(output) == ['foreman.target', 'postgresql.service', 'foreman.service']
+
+
+def test_parse_show():
+    output = "Id=a.service\nAfter=b.service c.target\n\nId=b.service\nAfter=\n"
+
+    assert startup_benchmark.parse_show(output) == [
+        {'Id': 'a.service', 'After': 'b.service c.target'},
+        {'Id': 'b.service', 'After': ''},
+    ]
+
+
+class TestUnitTimings:
+    """Test turning activation timestamps into timings"""
+
+    def test_seconds_after_start(self):
+        timings = startup_benchmark.unit_timings([unit('postgresql.service', 0.5, 4.5, after='network.target')], SINCE)
+
+        assert timings == {'postgresql.service': {'started': 0.5, 'ready': 4.5, 'seconds': 4.0, 'after': ['network.target']}}
+
+    def test_units_active_before_are_left_out(self):
+        timings = startup_benchmark.unit_timings([unit('network.target', -100, -99)], SINCE)
+
+        assert timings == {}
+
+    def test_units_not_active(self):
+        timings = startup_benchmark.unit_timings([unit('foreman.service', 1, None, state='activating')], SINCE)
+
+        assert timings['foreman.service']['ready'] is None
+        assert timings['foreman.service']['seconds'] is None
+
+
+def test_critical_chain():
+    timings = startup_benchmark.unit_timings([
+        unit('postgresql.service', 0, 5),
+        unit('redis.service', 0, 1),
+        unit('foreman.service', 5, 40, after='postgresql.service redis.service'),
+        unit('pulp-api.service', 5, 10, after='postgresql.service'),
+        unit('foreman.target', 40, 40, after='foreman.service pulp-api.service'),
+    ], SINCE)
+
+    chain = startup_benchmark.critical_chain(timings, 'foreman.target')
+
+    assert [link['name'] for link in chain] == ['postgresql.service', 'foreman.service', 'foreman.target']
+    assert chain[1] == {'name': 'foreman.service', 'ready': 40.0, 'seconds': 35.0}
+
+
+def test_critical_chain_target_not_active():
+    timings = startup_benchmark.unit_timings([unit('foreman.target', 1, None, state='inactive')], SINCE)
+
+    assert startup_benchmark.critical_chain(timings, 'foreman.target') == []
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestWaitForEndpoints:
+    """Test probing the endpoints while the target starts"""
+
+    ENDPOINTS = [{'name': 'foreman', 'url': 'https://foreman/api/v2/ping'},
+                 {'name': 'pulp', 'url': 'https://foreman/pulp/api/v3/status/'}]
+
+    def test_time_of_first_answer(self):
+        clock = FakeClock()
+        up = {'foreman': 30, 'pulp': 10}
+
+        answered = startup_benchmark.wait_for_endpoints(
+            self.ENDPOINTS, lambda endpoint: clock.now >= up[endpoint['name']], 0, 100, lambda: True,
+            interval=1, clock=clock, sleep=clock.sleep)
+
+        assert answered == {'foreman': 30, 'pulp': 10}
+
+    def test_waits_for_start_to_finish(self):
+        clock = FakeClock()
+
+        startup_benchmark.wait_for_endpoints(
+            self.ENDPOINTS, lambda endpoint: True, 0, 100, lambda: clock.now >= 5, interval=1, clock=clock, sleep=clock.sleep)
+
+        assert clock.now == 5
+
+    def test_deadline(self):
+        clock = FakeClock()
+
+        answered = startup_benchmark.wait_for_endpoints(
+            self.ENDPOINTS, lambda endpoint: endpoint['name'] == 'pulp', 0, 10, lambda: True,
+            interval=1, clock=clock, sleep=clock.sleep)
+
+        assert answered == {'foreman': None, 'pulp': 0}
+        assert clock.now <= 10
@@ -0,0 +1,108 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/plugins/modules'))
+
+import systemd_mark_restart
+import systemd_reload
+
+STAMP = 1_000_000_000_000_000_000
+BEFORE = STAMP - 1_000_000_000
+AFTER = STAMP + 1_000_000_000
+
+
+def touch(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns), follow_symlinks=False)
+
+
+def quadlets(tmp_path):
+    root = tmp_path / 'systemd'
+    (root / 'foreman.container.d').mkdir(parents=True)
+    (root / 'foreman.container').write_text('[Container]\n')
+    (root / 'foreman.container.d' / 'env.conf').write_text('[Container]\n')
+    (root / 'dynflow-sidekiq@.container').write_text('[Container]\n')
+    (root / 'dynflow-sidekiq@worker.container').symlink_to(root / 'dynflow-sidekiq@.container')
+    for path in [root / 'foreman.container.d' / 'env.conf', root / 'foreman.container.d', root / 'foreman.container',
+                 root / 'dynflow-sidekiq@.container', root / 'dynflow-sidekiq@worker.container', root]:
+        touch(path, BEFORE)
+    return root
+
+
+def test_unchanged(tmp_path):
+    root = quadlets(tmp_path)
+
+    assert systemd_reload.changed_units([str(root)], STAMP) == []
+
+
+def test_changed_file_and_drop_in(tmp_path):
+    root = quadlets(tmp_path)
+    touch(root / 'foreman.container', AFTER)
+    touch(root / 'foreman.container.d' / 'env.conf', AFTER)
+
+    assert systemd_reload.changed_units([str(root)], STAMP) == [
+        str(root / 'foreman.container'),
+        str(root / 'foreman.container.d' / 'env.conf'),
+    ]
+
+
+def test_removed_unit(tmp_path):
+    root = quadlets(tmp_path)
+    (root / 'foreman.container').unlink()
+
+    assert systemd_reload.changed_units([str(root)], STAMP) == [str(root)]
+
+
+def test_symlink_is_not_followed(tmp_path):
+    root = quadlets(tmp_path)
+    touch(root / 'dynflow-sidekiq@.container', AFTER)
+
+    assert systemd_reload.changed_units([str(root)], STAMP) == [str(root / 'dynflow-sidekiq@.container')]
+
+
+def test_missing_path(tmp_path):
+    assert systemd_reload.changed_units([str(tmp_path / 'missing')], STAMP) == []
+
+
+def test_stamp(tmp_path):
+    stamp = tmp_path / 'run' / 'systemd-reload'
+
+    assert systemd_reload.stamp_time(str(stamp)) is None
+
+    systemd_reload.write_stamp(str(stamp))
+
+    assert systemd_reload.stamp_time(str(stamp)) == stamp.stat().st_mtime_ns
+
+
+def test_marked_units(tmp_path):
+    marks = tmp_path / 'restart'
+
+    assert systemd_reload.marked_units(str(marks)) == []
+
+    systemd_mark_restart.mark_units(str(marks), ['valkey.service', 'foreman.service'])
+
+    assert systemd_reload.marked_units(str(marks)) == ['foreman.service', 'valkey.service']
+
+    systemd_reload.clear_marks(str(marks), ['foreman.service', 'valkey.service'])
+
+    assert systemd_reload.marked_units(str(marks)) == []
+
+
+def test_mark_units_reports_new_marks_only(tmp_path):
+    marks = str(tmp_path / 'restart')
+
+    assert systemd_mark_restart.mark_units(marks, ['foreman.service']) == ['foreman.service']
+    assert systemd_mark_restart.mark_units(marks, ['foreman.service', 'foreman-db-migrate.service']) == [
+        'foreman-db-migrate.service']
+
+
+def test_unit_name():
+    assert systemd_mark_restart.unit_name('valkey') == 'valkey.service'
+    assert systemd_mark_restart.unit_name('dynflow-sidekiq@worker') == 'dynflow-sidekiq@worker.service'
+    assert systemd_mark_restart.unit_name('pulp-worker.target') == 'pulp-worker.target'
+
+
+def test_only_active_units_are_restarted():
+    show = 'ActiveState=active\n\nActiveState=inactive\n\nActiveState=active\n'
+
+    assert systemd_reload.active_units(['foreman.service', 'candlepin.service', 'foreman-db-migrate.service'], show) == [
+        'foreman.service', 'foreman-db-migrate.service']
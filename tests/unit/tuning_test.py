@@ -0,0 +1,113 @@
+import os
+
+import pytest
+import yaml
+from tuning import connection_budget
+from tuning import tuning_plan
+
+PROFILES = [
+    # cpus, ram, profile
+    (8, 32768, 'medium'),
+    (16, 65536, 'large'),
+    (32, 131072, 'extra-large'),
+    (48, 262144, 'extra-extra-large'),
+]
+
+
+def facts(cpus, ram_mb, rotational=None):
+    host = {'processor_nproc': cpus, 'memtotal_mb': ram_mb}
+    if rotational is not None:
+        host['devices'] = {'sda': {'rotational': '1' if rotational else '0'}, 'loop0': {'rotational': '0'}}
+    return host
+
+
+@pytest.mark.parametrize('cpus, ram_mb, profile', PROFILES)
+def test_matches_fixed_profiles(cpus, ram_mb, profile):
+    with open(os.path.join(os.path.dirname(__file__), '../../src/vars/tuning', f'{profile}.yml')) as profile_file:
+        fixed = yaml.safe_load(profile_file)
+
+    plan = tuning_plan(facts(cpus, ram_mb))
+
+    for name in ['postgresql_shared_buffers', 'postgresql_effective_cache_size', 'httpd_server_limit',
+                 'httpd_max_request_workers', 'backup_dump_concurrency', 'backup_dump_jobs']:
+        assert plan[name] == fixed[name], name
+
+
+def test_between_profiles():
+    medium = tuning_plan(facts(8, 32768))
+    large = tuning_plan(facts(16, 65536))
+
+    plan = tuning_plan(facts(12, 49152))
+
+    assert plan['postgresql_shared_buffers'] == '6GB'
+    assert medium['foreman_puma_workers'] < plan['foreman_puma_workers'] < large['foreman_puma_workers']
+    assert medium['postgresql_max_connections'] < plan['postgresql_max_connections'] < \
+        large['postgresql_max_connections']
+
+
+def test_connections_cover_every_pool():
+    plan = tuning_plan(facts(16, 65536))
+    connections = plan['connections']
+
+    assert connections['foreman_puma'] == plan['foreman_puma_workers'] * 5
+    assert connections['pulp'] == (plan['pulp_api_service_worker_count'] + plan['pulp_content_service_worker_count']
+                                   + 2 * plan['pulp_worker_count'])
+    assert plan['postgresql_max_connections'] == sum(connections.values())
+    assert connections['headroom'] >= 0.2 * (sum(connections.values()) - connections['headroom'])
+
+
+def test_iop_connections():
+    without_iop = tuning_plan(facts(16, 65536))
+    with_iop = tuning_plan(facts(16, 65536), ['katello', 'iop'])
+
+    assert 'iop' not in without_iop['connections']
+    assert with_iop['postgresql_max_connections'] > without_iop['postgresql_max_connections']
+
+
+def test_small_host_keeps_minimums():
+    plan = tuning_plan(facts(2, 4096))
+
+    assert plan['foreman_puma_workers'] == 2
+    assert plan['postgresql_shared_buffers'] == '512MB'
+    assert plan['candlepin_java_opts_xmx'] == '4g'
+    assert plan['postgresql_max_connections'] >= 100
+
+
+def test_rotational_disks_limit_parallel_jobs():
+    plan = tuning_plan(facts(32, 131072, rotational=True))
+
+    assert plan['rotational']
+    assert plan['backup_dump_jobs'] == 2
+    assert plan['restore_database_concurrency'] == 2
+    assert not tuning_plan(facts(32, 131072, rotational=False))['rotational']
+
+
+POOLS = {
+    'foreman_puma_workers': '24',
+    'foreman_puma_threads_max': '5',
+    'foreman_database_pool': 9,
+    'pulp_api_service_worker_count': '5',
+    'pulp_content_service_worker_count': '17',
+    'pulp_worker_count': '8',
+}
+
+
+def test_connection_budget_of_configured_pools():
+    connections = connection_budget(POOLS)
+
+    assert connections == {'foreman_puma': 120, 'dynflow': 27, 'pulp': 38, 'candlepin': 30, 'maintenance': 20}
+
+
+def test_connection_budget_puma_threads_limited_by_pool():
+    connections = connection_budget(dict(POOLS, foreman_puma_threads_max=16))
+
+    assert connections['foreman_puma'] == 24 * 9
+
+
+def test_connection_budget_with_pooler():
+    connections = connection_budget(dict(POOLS, pooler_pool_size='50', iop=True))
+
+    assert 'foreman_puma' not in connections
+    assert 'dynflow' not in connections
+    assert connections['pooler'] == 50
+    assert connections['iop'] == 60